@@ -0,0 +1,351 @@
+# batchSimulator.py
+# -----------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+A NumPy simulator that plays many independent classic Pacman games in
+lockstep, for Monte Carlo evaluation of Pacman policies against RandomGhost
+or DirectionalGhost ghosts.  The rules are the ones of PacmanRules and
+GhostRules in pacman.py; checkConsistency replays real games through the
+simulator to verify that both agree, and the engine question of
+autograder.py runs it on every grading.
+
+Positions are stored in half-cell units (x2, y2 = 2*x, 2*y) so that scared
+ghosts, which move at half speed, stay on integer coordinates.  Directions
+are indices into DIRECTIONS, which is also the bit order of the legal-action
+masks of game.Actions.getActionTable.
+
+A Pacman policy is a function policy(simulator, legalMasks) returning an
+int array with one direction index per game; entries for finished games are
+ignored.  To evaluate a policy from the command line:
+
+> python batchSimulator.py -l mediumClassic -n 10000 -g DirectionalGhost
+"""
+
+import numpy as np
+from game import Actions, Directions
+import pacman
+import sys, time
+
+DIRECTIONS = list(Actions._directions)
+STOP = DIRECTIONS.index(Directions.STOP)
+REVERSE = np.array([DIRECTIONS.index(Directions.REVERSE[d]) for d in DIRECTIONS])
+VECTORS = np.array([Actions._directions[d] for d in DIRECTIONS], dtype=np.int64)
+
+class BatchSimulator:
+    """
+    The state of numGames games on the same layout, stored as arrays whose
+    first axis is the game.
+    """
+
+    def __init__(self, layout, numGames, numGhosts=1000, ghostType='RandomGhost', seed=None):
+        if ghostType not in ['RandomGhost', 'DirectionalGhost']:
+            raise Exception('The batch simulator does not support ghost type ' + str(ghostType))
+        self.layout = layout
+        self.numGames = numGames
+        self.ghostType = ghostType
+        self.random = np.random.default_rng(seed)
+
+        # Legal-action masks of every open cell, shared with the game rules
+        self.masks = np.zeros((layout.width, layout.height), dtype=np.int64)
+        for (x, y), entry in Actions.getActionTable(layout.walls).items():
+            self.masks[x][y] = entry[0]
+
+        # Agents are set up as in GameStateData.initialize
+        starts = []
+        ghosts = 0
+        for isPacman, pos in layout.agentPositions:
+            if not isPacman:
+                if ghosts == numGhosts: continue
+                ghosts += 1
+            starts.append(pos)
+        self.numAgents = len(starts)
+        self.numGhosts = self.numAgents - 1
+        self.starts = 2 * np.array(starts, dtype=np.int64)
+
+        self.x2 = np.tile(self.starts[:, 0], (numGames, 1))
+        self.y2 = np.tile(self.starts[:, 1], (numGames, 1))
+        self.direction = np.full((numGames, self.numAgents), STOP, dtype=np.int64)
+        self.scaredTimer = np.zeros((numGames, self.numAgents), dtype=np.int64)
+        self.food = np.tile(np.array(layout.food.data, dtype=bool), (numGames, 1, 1))
+        self.numFood = self.food.sum(axis=(1, 2))
+        self.capsules = np.zeros((numGames, layout.width, layout.height), dtype=bool)
+        for x, y in layout.capsules:
+            self.capsules[:, x, y] = True
+        self.score = np.zeros(numGames, dtype=np.int64)
+        self.win = np.zeros(numGames, dtype=bool)
+        self.lose = np.zeros(numGames, dtype=bool)
+        self.numMoves = 0
+
+    def isActive(self):
+        return ~(self.win | self.lose)
+
+    def getPositions(self, agentIndex):
+        """
+        Returns an (numGames, 2) float array of the positions of an agent.
+        """
+        return np.stack([self.x2[:, agentIndex], self.y2[:, agentIndex]], axis=1) / 2.0
+
+    def getLegalPacmanMasks(self):
+        x, y = self.x2[:, 0] // 2, self.y2[:, 0] // 2
+        return self.masks[x, y]
+
+    def getLegalGhostMasks(self, ghostIndex):
+        """
+        Returns the legal-action masks of a ghost in every game: no stopping,
+        no turning around outside dead ends, and no turning at all between
+        grid points.
+        """
+        x2, y2 = self.x2[:, ghostIndex], self.y2[:, ghostIndex]
+        direction = self.direction[:, ghostIndex]
+        onGrid = (x2 % 2 == 0) & (y2 % 2 == 0)
+        masks = self.masks[x2 // 2, y2 // 2] & ~(1 << STOP)
+        withoutReverse = masks & ~(1 << REVERSE[direction])
+        masks = np.where(popCount(withoutReverse) > 0, withoutReverse, masks)
+        return np.where(onGrid, masks, 1 << direction)
+
+    def getGhostActions(self, ghostIndex):
+        """
+        Samples the actions of a ghost in every game from the distribution of
+        the simulator's ghost type.
+        """
+        legal = (self.getLegalGhostMasks(ghostIndex)[:, None] >> np.arange(STOP)) & 1 == 1
+        numLegal = legal.sum(axis=1)
+        if self.ghostType == 'RandomGhost':
+            probs = legal / np.maximum(numLegal, 1)[:, None]
+        else:
+            scared = self.scaredTimer[:, ghostIndex] > 0
+            speed = np.where(scared, 1, 2)
+            nx = self.x2[:, ghostIndex, None] + VECTORS[None, :STOP, 0] * speed[:, None]
+            ny = self.y2[:, ghostIndex, None] + VECTORS[None, :STOP, 1] * speed[:, None]
+            distances = np.abs(nx - self.x2[:, 0, None]) + np.abs(ny - self.y2[:, 0, None])
+            bestDistance = np.where(scared,
+                                    np.where(legal, distances, -1).max(axis=1),
+                                    np.where(legal, distances, sys.maxsize).min(axis=1))
+            best = legal & (distances == bestDistance[:, None])
+            bestProb = 0.8
+            probs = best * (bestProb / np.maximum(best.sum(axis=1), 1))[:, None]
+            probs = probs + legal * ((1 - bestProb) / np.maximum(numLegal, 1))[:, None]
+        return sampleActions(probs, self.random)
+
+    def step(self, agentIndex, actions):
+        """
+        Applies one move of agent agentIndex in every game that is still
+        being played, like GameState.generateSuccessor.
+        """
+        active = self.isActive()
+        actions = np.asarray(actions, dtype=np.int64)
+        if agentIndex == 0:
+            masks = self.getLegalPacmanMasks()
+        else:
+            masks = self.getLegalGhostMasks(agentIndex)
+        if np.any(active & ((masks >> actions) & 1 == 0)):
+            raise Exception("Illegal action in batch step for agent %d" % agentIndex)
+        games = np.nonzero(active)[0]
+        actions = actions[games]
+        scoreChange = np.zeros(len(games), dtype=np.int64)
+
+        if agentIndex == 0:
+            x2 = self.x2[games, 0] + 2 * VECTORS[actions, 0]
+            y2 = self.y2[games, 0] + 2 * VECTORS[actions, 1]
+            self.x2[games, 0], self.y2[games, 0] = x2, y2
+            self.direction[games, 0] = np.where(actions == STOP, self.direction[games, 0], actions)
+            x, y = x2 // 2, y2 // 2
+
+            # Eat food
+            ate = self.food[games, x, y]
+            eaters = games[ate]
+            self.food[eaters, x[ate], y[ate]] = False
+            self.numFood[eaters] -= 1
+            scoreChange += 10 * ate
+            won = ate & (self.numFood[games] == 0)
+            scoreChange += 500 * won
+            self.win[games[won]] = True
+
+            # Eat capsule
+            capsule = self.capsules[games, x, y]
+            self.capsules[games[capsule], x[capsule], y[capsule]] = False
+            self.scaredTimer[games[capsule], 1:] = pacman.SCARED_TIME
+
+            scoreChange -= pacman.TIME_PENALTY
+            for ghostIndex in range(1, self.numAgents):
+                scoreChange += self._checkDeath(games, ghostIndex)
+        else:
+            scared = self.scaredTimer[games, agentIndex] > 0
+            speed = np.where(scared, 1, 2)
+            self.x2[games, agentIndex] += VECTORS[actions, 0] * speed
+            self.y2[games, agentIndex] += VECTORS[actions, 1] * speed
+            self.direction[games, agentIndex] = np.where(actions == STOP, self.direction[games, agentIndex], actions)
+
+            # Time passes; a ghost snaps back to the grid as it stops being scared
+            timer = self.scaredTimer[games, agentIndex]
+            ending = games[timer == 1]
+            self.x2[ending, agentIndex] = 2 * ((self.x2[ending, agentIndex] + 1) // 2)
+            self.y2[ending, agentIndex] = 2 * ((self.y2[ending, agentIndex] + 1) // 2)
+            self.scaredTimer[games, agentIndex] = np.maximum(0, timer - 1)
+            scoreChange += self._checkDeath(games, agentIndex)
+
+        self.score[games] += scoreChange
+        self.numMoves += 1
+
+    def _checkDeath(self, games, ghostIndex):
+        """
+        Resolves collisions between Pacman and a ghost like GhostRules.checkDeath
+        and returns the resulting score changes.
+        """
+        distance = np.abs(self.x2[games, ghostIndex] - self.x2[games, 0]) + \
+                   np.abs(self.y2[games, ghostIndex] - self.y2[games, 0])
+        # COLLISION_TOLERANCE is 0.7, i.e. at most one half cell apart
+        collide = distance <= int(2 * pacman.COLLISION_TOLERANCE)
+        scared = self.scaredTimer[games, ghostIndex] > 0
+        eaten = games[collide & scared]
+        self.x2[eaten, ghostIndex] = self.starts[ghostIndex, 0]
+        self.y2[eaten, ghostIndex] = self.starts[ghostIndex, 1]
+        self.direction[eaten, ghostIndex] = STOP
+        self.scaredTimer[eaten, ghostIndex] = 0
+        killed = collide & ~scared & ~self.win[games]
+        self.lose[games[killed]] = True
+        return 200 * (collide & scared) - 500 * killed
+
+    def run(self, pacmanPolicy, maxMoves=None):
+        """
+        Plays every game to the end (or until maxMoves agent moves have been
+        made) with Pacman following pacmanPolicy.
+        """
+        agentIndex = 0
+        while np.any(self.isActive()):
+            if maxMoves != None and self.numMoves >= maxMoves: break
+            if agentIndex == 0:
+                actions = pacmanPolicy(self, self.getLegalPacmanMasks())
+            else:
+                actions = self.getGhostActions(agentIndex)
+            self.step(agentIndex, actions)
+            agentIndex = (agentIndex + 1) % self.numAgents
+
+def popCount(masks):
+    count = np.zeros_like(masks)
+    for bit in range(len(DIRECTIONS)):
+        count += (masks >> bit) & 1
+    return count
+
+def sampleActions(probs, generator):
+    """
+    Samples one direction index per row of a (numGames, k) probability array.
+    """
+    cumulative = np.cumsum(probs, axis=1)
+    r = generator.random(len(probs)) * cumulative[:, -1]
+    actions = (cumulative <= r[:, None]).sum(axis=1)
+    # Guard against rounding past the last action with non-zero probability
+    last = probs.shape[1] - 1 - np.argmax(probs[:, ::-1] > 0, axis=1)
+    return np.minimum(actions, last)
+
+def randomPolicy(simulator, legalMasks):
+    "A Pacman policy that picks a legal action uniformly at random."
+    legal = (legalMasks[:, None] >> np.arange(len(DIRECTIONS))) & 1
+    return sampleActions(legal.astype(float), simulator.random)
+
+def checkConsistency(layout, numGames=20, numGhosts=1000, ghostType='RandomGhost', pacmanType='GreedyAgent'):
+    """
+    Plays numGames regular games, replays their move histories through a
+    BatchSimulator and checks that both agree after every move.  Returns the
+    number of moves compared.
+    """
+    import ghostAgents, pacmanAgents, textDisplay
+    rules = pacman.ClassicGameRules()
+    pacmanAgent = getattr(pacmanAgents, pacmanType)()
+    ghosts = [getattr(ghostAgents, ghostType)(i + 1) for i in range(min(numGhosts, layout.getNumGhosts()))]
+    trajectories = []
+    for i in range(numGames):
+        game = rules.newGame(layout, pacmanAgent, ghosts, textDisplay.NullGraphics(), True)
+        state = game.state
+        game.run()
+        states = [state]
+        for agentIndex, action in game.moveHistory:
+            state = state.generateSuccessor(agentIndex, action)
+            states.append(state)
+        trajectories.append((game.moveHistory, states))
+
+    simulator = BatchSimulator(layout, numGames, numGhosts, ghostType)
+    compared = 0
+    move = 0
+    while np.any(simulator.isActive()):
+        agentIndex = move % simulator.numAgents
+        actions = np.full(numGames, STOP, dtype=np.int64)
+        for i, (history, states) in enumerate(trajectories):
+            if move < len(history):
+                actions[i] = DIRECTIONS.index(history[move][1])
+        simulator.step(agentIndex, actions)
+        move += 1
+        for i, (history, states) in enumerate(trajectories):
+            if move >= len(states): continue
+            state = states[move]
+            for index in range(simulator.numAgents):
+                agentState = state.data.agentStates[index]
+                expected = (agentState.getPosition(), agentState.scaredTimer)
+                actual = ((simulator.x2[i, index] / 2.0, simulator.y2[i, index] / 2.0), simulator.scaredTimer[i, index])
+                if expected != actual:
+                    raise Exception('Game %d, move %d: agent %d is %s instead of %s' % (i, move, index, actual, expected))
+            if (state.getScore(), state.getNumFood(), state.isWin(), state.isLose()) != \
+               (simulator.score[i], simulator.numFood[i], simulator.win[i], simulator.lose[i]):
+                raise Exception('Game %d, move %d: score/food/outcome differ' % (i, move))
+            compared += 1
+    return compared
+
+def readCommand( argv ):
+    from optparse import OptionParser
+    usageStr = """
+    USAGE:      python batchSimulator.py <options>
+    EXAMPLES:   (1) python batchSimulator.py -l mediumClassic -n 10000
+                    - evaluates a random Pacman over 10000 games
+                (2) python batchSimulator.py -l mediumClassic --check
+                    - checks the simulator against regular games
+    """
+    parser = OptionParser(usageStr)
+    parser.add_option('-n', '--numGames', dest='numGames', type='int',
+                      help=pacman.default('the number of GAMES to play'), metavar='GAMES', default=1000)
+    parser.add_option('-l', '--layout', dest='layout',
+                      help=pacman.default('the LAYOUT_FILE from which to load the map layout'),
+                      metavar='LAYOUT_FILE', default='mediumClassic')
+    parser.add_option('-g', '--ghosts', dest='ghost',
+                      help=pacman.default('the ghost agent TYPE: RandomGhost or DirectionalGhost'),
+                      metavar = 'TYPE', default='RandomGhost')
+    parser.add_option('-k', '--numghosts', type='int', dest='numGhosts',
+                      help=pacman.default('The maximum number of ghosts to use'), default=4)
+    parser.add_option('-m', '--maxMoves', type='int', dest='maxMoves',
+                      help=pacman.default('The maximum number of agent moves per game'), default=10000)
+    parser.add_option('-s', '--seed', dest='seed', type='int',
+                      help='Random seed for the simulator', default=None)
+    parser.add_option('--check', action='store_true', dest='check',
+                      help='Checks the simulator against regular games instead', default=False)
+    options, otherjunk = parser.parse_args(argv)
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+    return options
+
+if __name__ == '__main__':
+    import layout
+    options = readCommand( sys.argv[1:] )
+    lay = layout.getLayout( options.layout )
+    if lay == None: raise Exception("The layout " + options.layout + " cannot be found")
+    if options.check:
+        compared = checkConsistency(lay, options.numGames, options.numGhosts, options.ghost)
+        print('Simulator agrees with pacman.GameState on %d states' % compared)
+    else:
+        start = time.time()
+        simulator = BatchSimulator(lay, options.numGames, options.numGhosts, options.ghost, options.seed)
+        simulator.run(randomPolicy, options.maxMoves)
+        elapsed = time.time() - start
+        print('Average Score:', simulator.score.mean())
+        print('Win Rate:      %d/%d (%.2f)' % (simulator.win.sum(), options.numGames, simulator.win.mean()))
+        print('Unfinished:    %d' % simulator.isActive().sum())
+        print('Simulated %d moves of %d games in %.2f seconds' % (simulator.numMoves, options.numGames, elapsed))
@@ -0,0 +1,95 @@
+# benchmark.py
+# ------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Benchmarks for the game engine.  Games are played headless (no graphics, no
+output) and the time spent per simulated move is reported, e.g.
+
+> python benchmark.py -l originalClassic -k 4 -n 20
+"""
+
+import pacman, layout, textDisplay, util
+import sys, time, random
+
+def benchmarkRunGames(lay, pacmanAgent, ghosts, numGames, **runArgs):
+    """
+    Plays numGames quiet games with runGames and returns a tuple
+    (totalMoves, totalSeconds).  runArgs may include numProcesses.
+    """
+    display = textDisplay.NullGraphics()
+    util.mutePrint()
+    try:
+        start = time.time()
+        results = pacman.runGames(lay, pacmanAgent, ghosts, display, numGames, False, returnResults=True, **runArgs)
+        elapsed = time.time() - start
+    finally:
+        util.unmutePrint()
+    moves = sum([result['moves'] for result in results])
+    return moves, elapsed
+
+def readCommand( argv ):
+    """
+    Processes the command used to run the benchmarks from the command line.
+    """
+    from optparse import OptionParser
+    usageStr = """
+    USAGE:      python benchmark.py <options>
+    EXAMPLES:   python benchmark.py -l originalClassic -k 4 -n 20
+                    - times 20 headless games with four random ghosts
+    """
+    parser = OptionParser(usageStr)
+    parser.add_option('-n', '--numGames', dest='numGames', type='int',
+                      help=pacman.default('the number of GAMES to play'), metavar='GAMES', default=10)
+    parser.add_option('-l', '--layout', dest='layout',
+                      help=pacman.default('the LAYOUT_FILE from which to load the map layout'),
+                      metavar='LAYOUT_FILE', default='originalClassic')
+    parser.add_option('-p', '--pacman', dest='pacman',
+                      help=pacman.default('the agent TYPE in the pacmanAgents module to use'),
+                      metavar='TYPE', default='GreedyAgent')
+    parser.add_option('-g', '--ghosts', dest='ghost',
+                      help=pacman.default('the ghost agent TYPE in the ghostAgents module to use'),
+                      metavar = 'TYPE', default='RandomGhost')
+    parser.add_option('-k', '--numghosts', type='int', dest='numGhosts',
+                      help=pacman.default('The maximum number of ghosts to use'), default=4)
+    parser.add_option('-a','--agentArgs',dest='agentArgs',
+                      help='Comma separated values sent to agent. e.g. "opt1=val1,opt2,opt3=val3"')
+    parser.add_option('--trusted', action='store_true', dest='trustedAgents',
+                      help='Play with the trusted-agent game loop', default=False)
+    parser.add_option('-c', '--catchExceptions', action='store_true', dest='catchExceptions',
+                      help='Turns on exception handling and timeouts during games', default=False)
+    parser.add_option('-s', '--seed', dest='seed', type='int',
+                      help=pacman.default('Random seed used for the games'), default=0)
+
+    options, otherjunk = parser.parse_args(argv)
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+    return options
+
+def runBenchmarks( options ):
+    random.seed(options.seed)
+    lay = layout.getLayout( options.layout )
+    if lay == None: raise Exception("The layout " + options.layout + " cannot be found")
+    pacmanType = pacman.loadAgent(options.pacman, True)
+    pacmanAgent = pacmanType(**pacman.parseAgentArgs(options.agentArgs))
+    ghostType = pacman.loadAgent(options.ghost, True)
+    ghosts = [ghostType( i+1 ) for i in range( options.numGhosts )]
+
+    moves, elapsed = benchmarkRunGames(lay, pacmanAgent, ghosts, options.numGames,
+                                       catchExceptions=options.catchExceptions,
+                                       trustedAgents=options.trustedAgents)
+    print('runGames:      %d games, %d moves in %.2f seconds' % (options.numGames, moves, elapsed))
+    print('Per move:      %.1f us (%d moves/s)' % (1e6 * elapsed / max(moves, 1), moves / max(elapsed, 1e-9)))
+
+if __name__ == '__main__':
+    runBenchmarks( readCommand( sys.argv[1:] ) )
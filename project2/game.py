@@ -22,6 +22,7 @@
 
 from util import *
 import time, os
+import random
 import traceback
 import sys
 
@@ -167,6 +168,10 @@ class Grid:
 
     The __str__ method constructs an output that is oriented like a pacman board.
     """
+    # Class-level defaults, for grids unpickled from before these caches existed
+    _actionTable = None # Built by Actions.getActionTable for wall grids
+    _mazeGraph = None # Built by mazeGraph.getMazeGraph for wall grids
+
     def __init__(self, width, height, initialValue=False, bitRepresentation=None):
         if initialValue not in [False, True]: raise Exception('Grids can only contain booleans')
         self.CELLS_PER_INT = 30
@@ -329,7 +334,63 @@ class Actions:
         return (dx * speed, dy * speed)
     directionToVector = staticmethod(directionToVector)
 
+    # Bit of each direction in the legal-action masks of getActionTable
+    _directionBits = dict([(dir, 1 << i) for i, dir in enumerate(_directions)])
+
+    def getActionTable(walls):
+        """
+        Returns a dictionary mapping every open integer cell (x,y) of a wall
+        grid to a tuple (mask, actions, neighbors, ghostActions):
+
+          mask:         bitmask of the legal directions (see _directionBits)
+          actions:      the legal directions, in the order getPossibleActions
+                        has always returned them
+          neighbors:    the cells returned by getLegalNeighbors
+          ghostActions: a dictionary from the current direction of a ghost to
+                        its legal directions (no stopping or turning around
+                        except in dead ends)
+
+        Walls never change during a game, so the table is built once and kept
+        on the grid.  It must not be used with a wall grid that is modified
+        afterwards.
+        """
+        if walls._actionTable != None:
+            return walls._actionTable
+        table = {}
+        for x in range(walls.width):
+            for y in range(walls.height):
+                if walls[x][y]: continue
+                mask = 0
+                actions = []
+                neighbors = []
+                for dir, vec in Actions._directionsAsList:
+                    dx, dy = vec
+                    next_x, next_y = x + dx, y + dy
+                    if not walls[next_x][next_y]:
+                        mask |= Actions._directionBits[dir]
+                        actions.append(dir)
+                    if next_x < 0 or next_x == walls.width: continue
+                    if next_y < 0 or next_y == walls.height: continue
+                    if not walls[next_x][next_y]: neighbors.append((next_x, next_y))
+                ghostActions = {}
+                for direction in Actions._directions:
+                    legal = [a for a in actions if a != Directions.STOP]
+                    reverse = Actions.reverseDirection(direction)
+                    if reverse in legal and len(legal) > 1:
+                        legal.remove(reverse)
+                    ghostActions[direction] = tuple(legal)
+                table[(x, y)] = (mask, tuple(actions), tuple(neighbors), ghostActions)
+        walls._actionTable = table
+        return table
+    getActionTable = staticmethod(getActionTable)
+
     def getPossibleActions(config, walls):
+        entry = Actions.getActionTable(walls).get(config.pos)
+        if entry != None:
+            return list(entry[1])
+
+        # Fall back to probing the walls, e.g. for scared ghosts that are
+        # between grid points
         possible = []
         x, y = config.pos
         x_int, y_int = int(x + 0.5), int(y + 0.5)
@@ -351,6 +412,9 @@ class Actions:
     def getLegalNeighbors(position, walls):
         x,y = position
         x_int, y_int = int(x + 0.5), int(y + 0.5)
+        entry = Actions.getActionTable(walls).get((x_int, y_int))
+        if entry != None:
+            return list(entry[2])
         neighbors = []
         for dir, vec in Actions._directionsAsList:
             dx, dy = vec
@@ -368,6 +432,19 @@ class Actions:
         return (x + dx, y + dy)
     getSuccessor = staticmethod(getSuccessor)
 
+_ZOBRIST_TABLES = {}
+
+def zobristTable(width, height):
+    """
+    Returns a width x height table of random 64-bit keys used to hash sets of
+    cells.  Tables are shared by all grids of the same size and use their own
+    generator so that the global random sequence is left untouched.
+    """
+    if (width, height) not in _ZOBRIST_TABLES:
+        rng = random.Random(width * 1000003 + height)
+        _ZOBRIST_TABLES[(width, height)] = [[rng.getrandbits(64) for y in range(height)] for x in range(width)]
+    return _ZOBRIST_TABLES[(width, height)]
+
 class GameStateData:
     """
 
@@ -383,7 +460,13 @@ class GameStateData:
             self.layout = prevState.layout
             self._eaten = prevState._eaten
             self.score = prevState.score
+            self._foodHash = prevState._foodHash
+            self._numFood = prevState._numFood
+        else:
+            self._foodHash = None
+            self._numFood = None
 
+        self._hash = None
         self._foodEaten = None
         self._foodAdded = None
         self._capsuleEaten = None
@@ -395,7 +478,7 @@ class GameStateData:
     def deepCopy( self ):
         state = GameStateData( self )
         state.food = self.food.deepCopy()
-        state.layout = self.layout.deepCopy()
+        # Layouts are static and shared by every state of a game
         state._agentMoved = self._agentMoved
         state._foodEaten = self._foodEaten
         state._foodAdded = self._foodAdded
@@ -423,14 +506,50 @@ class GameStateData:
     def __hash__( self ):
         """
         Allows states to be keys of dictionaries.
+
+        The hash is computed once per state.  The food contribution is a
+        Zobrist key that is kept up to date by removeFood, so hashing never
+        walks the food grid once it is known.
         """
-        for i, state in enumerate( self.agentStates ):
-            try:
-                int(hash(state))
-            except TypeError as e:
-                print(e)
-                #hash(state)
-        return int((hash(tuple(self.agentStates)) + 13*hash(self.food) + 113* hash(tuple(self.capsules)) + 7 * hash(self.score)) % 1048575 )
+        if self._hash is None:
+            self._hash = hash((tuple(self.agentStates), self.getFoodHash(), tuple(self.capsules), self.score))
+        return self._hash
+
+    def getFoodHash( self ):
+        """
+        Returns the Zobrist key of the remaining food, computing it from the
+        food grid the first time it is needed.
+        """
+        if self._foodHash is None:
+            table = zobristTable(self.food.width, self.food.height)
+            h = 0
+            for x, column in enumerate(self.food.data):
+                for y, hasFood in enumerate(column):
+                    if hasFood: h ^= table[x][y]
+            self._foodHash = h
+        return self._foodHash
+
+    def getNumFood( self ):
+        """
+        Returns the amount of food left, counting the food grid only the first
+        time it is needed.
+        """
+        if self._numFood is None:
+            self._numFood = self.food.count()
+        return self._numFood
+
+    def removeFood( self, x, y ):
+        """
+        Removes the food at (x,y), copying the food grid first since it may
+        be shared with the predecessor state, and updates the food key and
+        count.
+        """
+        self.food = self.food.copy()
+        self.food[x][y] = False
+        if self._foodHash is not None:
+            self._foodHash ^= zobristTable(self.food.width, self.food.height)[x][y]
+        if self._numFood is not None:
+            self._numFood -= 1
 
     def __str__( self ):
         width, height = self.layout.width, self.layout.height
@@ -494,6 +613,9 @@ class GameStateData:
         self.layout = layout
         self.score = 0
         self.scoreChange = 0
+        self._foodHash = None
+        self._numFood = layout.totalFood
+        self._hash = None
 
         self.agentStates = []
         numGhosts = 0
@@ -515,7 +637,7 @@ class Game:
     The Game manages the control flow, soliciting actions from agents.
     """
 
-    def __init__( self, agents, display, rules, startingIndex=0, muteAgents=False, catchExceptions=False ):
+    def __init__( self, agents, display, rules, startingIndex=0, muteAgents=False, catchExceptions=False, trustedAgents=False, profiler=None, recorder=None ):
         self.agentCrashed = False
         self.agents = agents
         self.display = display
@@ -524,6 +646,9 @@ class Game:
         self.gameOver = False
         self.muteAgents = muteAgents
         self.catchExceptions = catchExceptions
+        self.trustedAgents = trustedAgents
+        self.profiler = profiler # Optional gameProfiler.GameProfiler
+        self.recorder = recorder # Optional gameRecording.RecordingWriter
         self.moveHistory = []
         self.totalAgentTimes = [0 for agent in agents]
         self.totalAgentTimeWarnings = [0 for agent in agents]
@@ -544,6 +669,11 @@ class Game:
         self.agentCrashed = True
         self.rules.agentCrash(self, agentIndex)
 
+    def _profiled( self, agentIndex, phase, function ):
+        "Returns function timed by the profiler, if there is one"
+        if self.profiler == None: return function
+        return self.profiler.wrap(agentIndex, phase, function)
+
     OLD_STDOUT = None
     OLD_STDERR = None
 
@@ -566,7 +696,23 @@ class Game:
 
     def run( self ):
         """
-        Main control loop for game play.
+        Main control loop for game play.  The profiler, if there is one, is
+        told of the end of the game on every exit, crashes and timeouts
+        included.
+        """
+        try:
+            if self.trustedAgents:
+                self.runTrusted()
+            else:
+                self.runUntrusted()
+        finally:
+            if self.profiler != None: self.profiler.gameFinished(self)
+
+    def runUntrusted( self ):
+        """
+        Control loop for agents that may modify the states they are given:
+        agents see deep copies, and with catchExceptions their calls are
+        limited with SIGALRM timeouts.
         """
         self.display.initialize(self.state.data)
         self.numMoves = 0
@@ -587,7 +733,7 @@ class Game:
                 self.mute(i)
                 if self.catchExceptions:
                     try:
-                        timed_func = TimeoutFunction(agent.registerInitialState, int(self.rules.getMaxStartupTime(i)))
+                        timed_func = TimeoutFunction(self._profiled(i, 'registerInitialState', agent.registerInitialState), int(self.rules.getMaxStartupTime(i)))
                         try:
                             start_time = time.time()
                             timed_func(self.state.deepCopy())
@@ -604,7 +750,7 @@ class Game:
                         self.unmute()
                         return
                 else:
-                    agent.registerInitialState(self.state.deepCopy())
+                    self._profiled(i, 'registerInitialState', agent.registerInitialState)(self.state.deepCopy())
                 ## TODO: could this exceed the total time
                 self.unmute()
 
@@ -621,7 +767,7 @@ class Game:
                 self.mute(agentIndex)
                 if self.catchExceptions:
                     try:
-                        timed_func = TimeoutFunction(agent.observationFunction, int(self.rules.getMoveTimeout(agentIndex)))
+                        timed_func = TimeoutFunction(self._profiled(agentIndex, 'observationFunction', agent.observationFunction), int(self.rules.getMoveTimeout(agentIndex)))
                         try:
                             start_time = time.time()
                             observation = timed_func(self.state.deepCopy())
@@ -634,7 +780,7 @@ class Game:
                         self.unmute()
                         return
                 else:
-                    observation = agent.observationFunction(self.state.deepCopy())
+                    observation = self._profiled(agentIndex, 'observationFunction', agent.observationFunction)(self.state.deepCopy())
                 self.unmute()
             else:
                 observation = self.state.deepCopy()
@@ -644,7 +790,7 @@ class Game:
             self.mute(agentIndex)
             if self.catchExceptions:
                 try:
-                    timed_func = TimeoutFunction(agent.getAction, int(self.rules.getMoveTimeout(agentIndex)) - int(move_time))
+                    timed_func = TimeoutFunction(self._profiled(agentIndex, 'getAction', agent.getAction), int(self.rules.getMoveTimeout(agentIndex)) - int(move_time))
                     try:
                         start_time = time.time()
                         if skip_action:
@@ -683,24 +829,25 @@ class Game:
                     self.unmute()
                     return
             else:
-                action = agent.getAction(observation)
+                action = self._profiled(agentIndex, 'getAction', agent.getAction)(observation)
             self.unmute()
 
             # Execute the action
+            if self.recorder != None: self.recorder.observeState(len(self.moveHistory), self.state)
             self.moveHistory.append( (agentIndex, action) )
             if self.catchExceptions:
                 try:
-                    self.state = self.state.generateSuccessor( agentIndex, action )
+                    self.state = self._profiled(agentIndex, 'generateSuccessor', self.state.generateSuccessor)( agentIndex, action )
                 except Exception as data:
                     self.mute(agentIndex)
                     self._agentCrash(agentIndex)
                     self.unmute()
                     return
             else:
-                self.state = self.state.generateSuccessor( agentIndex, action )
+                self.state = self._profiled(agentIndex, 'generateSuccessor', self.state.generateSuccessor)( agentIndex, action )
 
             # Change the display
-            self.display.update( self.state.data )
+            self._profiled(agentIndex, 'display', self.display.update)( self.state.data )
             ###idx = agentIndex - agentIndex % 2 + 1
             ###self.display.update( self.state.makeObservation(idx).data )
 
@@ -727,3 +874,131 @@ class Game:
                     self.unmute()
                     return
         self.display.finish()
+
+    def _checkAgentTime( self, agentIndex, move_time ):
+        """
+        Applies the per-move and total time limits of the rules after an agent
+        has moved.  Returns True if the agent ran out of time and crashed.
+        """
+        if move_time > self.rules.getMoveTimeout(agentIndex):
+            print("Agent %d timed out on a single move!" % agentIndex, file=sys.stderr)
+            self.agentTimeout = True
+            self._agentCrash(agentIndex, quiet=True)
+            return True
+        if move_time > self.rules.getMoveWarningTime(agentIndex):
+            self.totalAgentTimeWarnings[agentIndex] += 1
+            print("Agent %d took too long to make a move! This is warning %d" % (agentIndex, self.totalAgentTimeWarnings[agentIndex]), file=sys.stderr)
+            if self.totalAgentTimeWarnings[agentIndex] > self.rules.getMaxTimeWarnings(agentIndex):
+                print("Agent %d exceeded the maximum number of warnings: %d" % (agentIndex, self.totalAgentTimeWarnings[agentIndex]), file=sys.stderr)
+                self.agentTimeout = True
+                self._agentCrash(agentIndex, quiet=True)
+                return True
+        self.totalAgentTimes[agentIndex] += move_time
+        if self.totalAgentTimes[agentIndex] > self.rules.getMaxTotalTime(agentIndex):
+            print("Agent %d ran out of time! (time: %1.2f)" % (agentIndex, self.totalAgentTimes[agentIndex]), file=sys.stderr)
+            self.agentTimeout = True
+            self._agentCrash(agentIndex, quiet=True)
+            return True
+        return False
+
+    def runTrusted( self ):
+        """
+        Control loop for trusted agents that do not modify the states they are
+        given.  Agents see the live game state instead of a deep copy, their
+        optional methods are looked up once per game, and with catchExceptions
+        the time limits are checked against a monotonic clock after each call
+        instead of being enforced with SIGALRM, so a stuck agent is only
+        detected once it returns.
+        """
+        clock = time.perf_counter
+        self.display.initialize(self.state.data)
+        self.numMoves = 0
+
+        for i in range(len(self.agents)):
+            agent = self.agents[i]
+            if not agent:
+                self.mute(i)
+                print("Agent %d failed to load" % i, file=sys.stderr)
+                self.unmute()
+                self._agentCrash(i, quiet=True)
+                return
+            register = getattr(agent, 'registerInitialState', None)
+            if register != None:
+                register = self._profiled(i, 'registerInitialState', register)
+                self.mute(i)
+                start_time = clock()
+                try:
+                    register(self.state.deepCopy())
+                except Exception as data:
+                    if not self.catchExceptions: raise
+                    self._agentCrash(i, quiet=False)
+                    self.unmute()
+                    return
+                self.unmute()
+                time_taken = clock() - start_time
+                self.totalAgentTimes[i] += time_taken
+                if self.catchExceptions and time_taken > self.rules.getMaxStartupTime(i):
+                    print("Agent %d ran out of time on startup!" % i, file=sys.stderr)
+                    self.agentTimeout = True
+                    self._agentCrash(i, quiet=True)
+                    return
+
+        observers = [getattr(agent, 'observationFunction', None) for agent in self.agents]
+        observers = [observe and self._profiled(i, 'observationFunction', observe) for i, observe in enumerate(observers)]
+        actors = [self._profiled(i, 'getAction', agent.getAction) for i, agent in enumerate(self.agents)]
+        updates = [self._profiled(i, 'display', self.display.update) for i in range(len(self.agents))]
+        profiler, recorder, rules = self.profiler, self.recorder, self.rules
+        agentIndex = self.startingIndex
+        numAgents = len( self.agents )
+
+        while not self.gameOver:
+            self.mute(agentIndex)
+            start_time = clock()
+            try:
+                observe = observers[agentIndex]
+                if observe != None:
+                    observation = observe(self.state)
+                else:
+                    observation = self.state
+                action = actors[agentIndex](observation)
+            except Exception as data:
+                if not self.catchExceptions: raise
+                self._agentCrash(agentIndex)
+                self.unmute()
+                return
+            self.unmute()
+            if self.catchExceptions and self._checkAgentTime(agentIndex, clock() - start_time):
+                return
+
+            # Execute the action
+            if recorder != None: recorder.observeState(len(self.moveHistory), self.state)
+            self.moveHistory.append( (agentIndex, action) )
+            try:
+                if profiler == None:
+                    self.state = self.state.generateSuccessor( agentIndex, action )
+                else:
+                    self.state = self._profiled(agentIndex, 'generateSuccessor', self.state.generateSuccessor)( agentIndex, action )
+            except Exception as data:
+                if not self.catchExceptions: raise
+                self.mute(agentIndex)
+                self._agentCrash(agentIndex)
+                self.unmute()
+                return
+
+            updates[agentIndex]( self.state.data )
+            rules.process(self.state, self)
+            agentIndex = ( agentIndex + 1 ) % numAgents
+
+        for agentIndex, agent in enumerate(self.agents):
+            final = getattr(agent, 'final', None)
+            if final != None:
+                try:
+                    self.mute(agentIndex)
+                    final( self.state )
+                    self.unmute()
+                except Exception as data:
+                    if not self.catchExceptions: raise data
+                    self._agentCrash(agentIndex)
+                    self.unmute()
+                    return
+        self.display.finish()
@@ -0,0 +1,168 @@
+# gameProfiler.py
+# ---------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Per-agent timing of games.  A GameProfiler given to a Game (or to runGames)
+records the latency of every call made on behalf of each agent, split by
+phase:
+
+  registerInitialState, observationFunction, getAction:  the agent's methods
+  generateSuccessor:  applying the agent's action to the game state
+  display:            updating the display after the agent's move
+
+Latencies are kept as histograms with power-of-two microsecond buckets, so
+a profiler can accumulate any number of games in constant memory.  Agent
+methods can also be run under cProfile.
+"""
+
+import time, json
+
+PHASES = ['registerInitialState', 'observationFunction', 'getAction', 'generateSuccessor', 'display']
+AGENT_PHASES = PHASES[:3]
+NUM_BUCKETS = 32 # Bucket i holds latencies below 2**i microseconds
+
+class PhaseStats:
+    """
+    Call count, total and maximum time and latency histogram of one phase of
+    one agent.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = [0] * NUM_BUCKETS
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max: self.max = seconds
+        bucket = min(int(seconds * 1e6).bit_length(), NUM_BUCKETS - 1)
+        self.histogram[bucket] += 1
+
+    def merge(self, other):
+        self.count += other['count']
+        self.total += other['total']
+        self.max = max(self.max, other['max'])
+        for i, n in enumerate(other['histogram']):
+            self.histogram[i] += n
+
+    def percentile(self, fraction):
+        """
+        Returns the upper bound in seconds of the bucket holding the given
+        fraction of the calls, which is never more than the slowest call.
+        """
+        seen = 0
+        for i, n in enumerate(self.histogram):
+            seen += n
+            if seen >= fraction * self.count: return min((2 ** i) / 1e6, self.max)
+        return self.max
+
+    def asDict(self):
+        return {'count': self.count, 'total': self.total, 'max': self.max, 'histogram': self.histogram}
+
+class GameProfiler:
+    """
+    Accumulates per-agent, per-phase timings over one or more games.
+    """
+
+    def __init__(self, useCProfile=False):
+        self.useCProfile = useCProfile
+        self.stats = {}
+        self.cProfiles = {}
+        self.numGames = 0
+        self.numMoves = 0
+
+    def record(self, agentIndex, phase, seconds):
+        key = (agentIndex, phase)
+        if key not in self.stats: self.stats[key] = PhaseStats()
+        self.stats[key].add(seconds)
+
+    def wrap(self, agentIndex, phase, function):
+        """
+        Returns function wrapped so that its calls are timed (and, for agent
+        methods with useCProfile, run under the agent's cProfile profiler).
+        """
+        clock = time.perf_counter
+        profile = None
+        if self.useCProfile and phase in AGENT_PHASES:
+            import cProfile
+            if agentIndex not in self.cProfiles: self.cProfiles[agentIndex] = cProfile.Profile()
+            profile = self.cProfiles[agentIndex]
+        def timed(*args):
+            start = clock()
+            if profile != None: profile.enable()
+            try:
+                return function(*args)
+            finally:
+                if profile != None: profile.disable()
+                self.record(agentIndex, phase, clock() - start)
+        return timed
+
+    def gameFinished(self, game):
+        self.numGames += 1
+        self.numMoves += len(game.moveHistory)
+
+    def asDict(self):
+        return {'games': self.numGames,
+                'moves': self.numMoves,
+                'agents': dict([('%d:%s' % key, stats.asDict()) for key, stats in sorted(self.stats.items())])}
+
+    def merge(self, other):
+        """
+        Adds the timings of another profiler, given as its asDict(), e.g. from
+        a worker process.
+        """
+        self.numGames += other['games']
+        self.numMoves += other['moves']
+        for name, stats in other['agents'].items():
+            agentIndex, phase = name.split(':')
+            key = (int(agentIndex), phase)
+            if key not in self.stats: self.stats[key] = PhaseStats()
+            self.stats[key].merge(stats)
+
+    def rows(self):
+        """
+        Returns one summary row per agent and phase:
+        (agent, phase, calls, total, mean, p50, p90, p99, max), times in seconds.
+        """
+        rows = []
+        for (agentIndex, phase), stats in sorted(self.stats.items(), key=lambda item: (item[0][0], PHASES.index(item[0][1]))):
+            rows.append((agentIndex, phase, stats.count, stats.total, stats.total / max(stats.count, 1),
+                         stats.percentile(0.5), stats.percentile(0.9), stats.percentile(0.99), stats.max))
+        return rows
+
+    def write(self, fileName):
+        """
+        Writes the timings as CSV if fileName ends with .csv, as JSON
+        otherwise.  cProfile statistics go to fileName.agent<i>.pstats.
+        """
+        f = open(fileName, 'w')
+        try:
+            if fileName.endswith('.csv'):
+                import csv
+                writer = csv.writer(f)
+                writer.writerow(['agent', 'phase', 'calls', 'total', 'mean', 'p50', 'p90', 'p99', 'max'])
+                writer.writerows(self.rows())
+            else:
+                json.dump(self.asDict(), f, indent=2)
+        finally:
+            f.close()
+        for agentIndex, profile in self.cProfiles.items():
+            profile.dump_stats('%s.agent%d.pstats' % (fileName, agentIndex))
+
+    def printSummary(self):
+        print('Agent  Phase                 Calls    Mean(ms)  p99(ms)   Max(ms)')
+        for agentIndex, phase, count, total, mean, p50, p90, p99, maximum in self.rows():
+            print('%5d  %-20s %6d %10.3f %8.3f %9.3f' % (agentIndex, phase, count, 1000 * mean, 1000 * p99, 1000 * maximum))
@@ -0,0 +1,226 @@
+# gameRecording.py
+# ----------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+A compact recording format for many games played on one layout.
+
+A recording file starts with a magic line followed by length-prefixed,
+zlib-compressed pickled records.  The first record holds the layout
+fingerprint and text; every following record is one game:
+
+  numAgents:         agents take turns, so the agent of each move is
+                     implied by its position in the stream
+  actions:           the actions packed as 4-bit direction codes
+  snapshotInterval:  a snapshot of the state is kept every this many moves,
+                     so any move can be reached by re-simulating at most
+                     snapshotInterval - 1 moves
+  snapshots:         compact states (see takeSnapshot)
+
+Games are appended as they finish, so a partly written file is readable up
+to its last complete game.
+"""
+
+import pickle, struct, zlib
+from game import Actions, reconstituteGrid
+
+MAGIC = b'PACREC1\n'
+DIRECTIONS = list(Actions._directions)
+SNAPSHOT_INTERVAL = 100
+
+def isRecording(fileName):
+    f = open(fileName, 'rb')
+    try: return f.read(len(MAGIC)) == MAGIC
+    finally: f.close()
+
+def packActions(actions):
+    """
+    Packs a list of directions two to a byte.
+    """
+    codes = [DIRECTIONS.index(action) for action in actions]
+    if len(codes) % 2 == 1: codes.append(0)
+    return bytes([codes[i] << 4 | codes[i + 1] for i in range(0, len(codes), 2)])
+
+def unpackActions(packed, numActions):
+    actions = []
+    for byte in packed:
+        actions.append(DIRECTIONS[byte >> 4])
+        actions.append(DIRECTIONS[byte & 15])
+    return actions[:numActions]
+
+def takeSnapshot(state):
+    """
+    Returns a compact, picklable summary of a non-terminal GameState.
+    """
+    data = state.data
+    agents = tuple([(s.configuration.pos, DIRECTIONS.index(s.configuration.direction), s.scaredTimer)
+                    for s in data.agentStates])
+    return (agents, data.food.packBits(), tuple(data.capsules), data.score)
+
+def restoreSnapshot(snapshot, layout):
+    """
+    Rebuilds the GameState summarized by takeSnapshot.
+    """
+    import pacman
+    from game import Configuration
+    agents, foodBits, capsules, score = snapshot
+    state = pacman.GameState()
+    state.initialize(layout, len(agents) - 1)
+    for agentState, (pos, direction, scaredTimer) in zip(state.data.agentStates, agents):
+        agentState.configuration = Configuration(pos, DIRECTIONS[direction])
+        agentState.scaredTimer = scaredTimer
+    state.data.food = reconstituteGrid(foodBits)
+    state.data._numFood = None
+    state.data._foodHash = None
+    state.data.capsules = list(capsules)
+    state.data.score = score
+    return state
+
+def _writeRecord(f, record):
+    data = zlib.compress(pickle.dumps(record, pickle.HIGHEST_PROTOCOL))
+    f.write(struct.pack('<I', len(data)))
+    f.write(data)
+
+def _readRecord(f):
+    header = f.read(4)
+    if len(header) < 4: return None
+    size, = struct.unpack('<I', header)
+    data = f.read(size)
+    if len(data) < size: return None # Truncated by an interrupted writer
+    return pickle.loads(zlib.decompress(data))
+
+class RecordingWriter:
+    """
+    Appends games played on one layout to a recording file.
+    """
+
+    def __init__(self, fileName, layout, snapshotInterval=SNAPSHOT_INTERVAL):
+        self.layout = layout
+        self.snapshotInterval = snapshotInterval
+        self.snapshots = [] # Of the game being played
+        self.file = open(fileName, 'wb')
+        self.file.write(MAGIC)
+        _writeRecord(self.file, {'fingerprint': layout.getFingerprint(),
+                                 'layoutText': layout.layoutText})
+        self.file.flush()
+
+    def observeState(self, move, state):
+        """
+        Called by Game with the state each move starts from, so that snapshots
+        are taken while the game is played.
+        """
+        if move == 0: self.snapshots = []
+        if move % self.snapshotInterval == 0:
+            self.snapshots.append(takeSnapshot(state))
+
+    def writeGame(self, game):
+        """
+        Writes a finished game from its (agentIndex, action) move history and
+        final state.  Games that were not played with this writer as their
+        recorder are written without snapshots.
+        """
+        moveHistory = game.moveHistory
+        if not moveHistory or game.recorder != self: self.snapshots = []
+        _writeRecord(self.file, {'numAgents': game.state.getNumAgents(),
+                                 'startingIndex': moveHistory[0][0] if moveHistory else 0,
+                                 'numMoves': len(moveHistory),
+                                 'actions': packActions([action for agentIndex, action in moveHistory]),
+                                 'snapshotInterval': self.snapshotInterval,
+                                 'snapshots': self.snapshots,
+                                 'score': game.state.getScore(),
+                                 'win': game.state.isWin()})
+        self.snapshots = []
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class RecordedGame:
+    """
+    One game of a recording.  Any intermediate state can be reached through
+    getState, which starts from the closest earlier snapshot.
+    """
+
+    def __init__(self, record, layout):
+        self.layout = layout
+        self.numAgents = record['numAgents']
+        self.startingIndex = record['startingIndex']
+        self.numMoves = record['numMoves']
+        self.packedActions = record['actions']
+        self.snapshotInterval = record['snapshotInterval']
+        self.snapshots = record['snapshots']
+        self.score = record['score']
+        self.win = record['win']
+        self._actions = None
+
+    def getActions(self):
+        if self._actions == None:
+            self._actions = unpackActions(self.packedActions, self.numMoves)
+        return self._actions
+
+    def getMoveHistory(self):
+        "Returns the moves as the (agentIndex, action) pairs of Game.moveHistory."
+        return [((self.startingIndex + i) % self.numAgents, action)
+                for i, action in enumerate(self.getActions())]
+
+    def getState(self, move):
+        """
+        Returns the GameState after the first move moves of the game.
+        """
+        if move < 0 or move > self.numMoves:
+            raise Exception('Move %d is outside of a game of %d moves' % (move, self.numMoves))
+        index = min(move // self.snapshotInterval, len(self.snapshots) - 1)
+        if index < 0:
+            # No snapshots (see writeGame): every move is re-simulated
+            import pacman
+            state = pacman.GameState()
+            state.initialize(self.layout, self.numAgents - 1)
+            index = 0
+        else:
+            state = restoreSnapshot(self.snapshots[index], self.layout)
+        history = self.getMoveHistory()
+        for agentIndex, action in history[index * self.snapshotInterval:move]:
+            state = state.generateSuccessor(agentIndex, action)
+        return state
+
+class RecordingReader:
+    """
+    Reads the games of a recording file one at a time.
+    """
+
+    def __init__(self, fileName, layout=None):
+        self.file = open(fileName, 'rb')
+        if self.file.read(len(MAGIC)) != MAGIC:
+            raise Exception(fileName + ' is not a game recording')
+        header = _readRecord(self.file)
+        self.fingerprint = header['fingerprint']
+        if layout == None:
+            import layout as layoutModule
+            layout = layoutModule.Layout(header['layoutText'])
+        elif layout.getFingerprint() != self.fingerprint:
+            raise Exception('The recording was made on a different layout')
+        self.layout = layout
+
+    def __iter__(self):
+        while True:
+            record = _readRecord(self.file)
+            if record == None: return
+            yield RecordedGame(record, self.layout)
+
+    def getGame(self, index):
+        for i, game in enumerate(self):
+            if i == index: return game
+        raise Exception('The recording has no game %d' % index)
+
+    def close(self):
+        self.file.close()
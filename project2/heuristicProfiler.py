@@ -0,0 +1,228 @@
+# heuristicProfiler.py
+# --------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Measures the quality and cost of search heuristics, to weigh a faster but
+weaker heuristic against a slower but better informed one.
+
+Where HeuristicTest only checks the start state, the profiler samples many
+states reachable from the start, computes their true costs to the goal and
+reports, per heuristic:
+
+  inadmissible:  sampled states where h exceeds the true cost
+  inconsistent:  sampled (state, successor) pairs where h drops by more
+                 than the step cost
+  h/h*:          the mean ratio of h to the true cost (1 is perfect)
+  us/call:       the mean time of one heuristic evaluation
+  expanded, b*:  the nodes expanded by A* from the start and its effective
+                 branching factor b*, the branching factor of a uniform
+                 tree of the solution depth holding that many nodes
+
+> python heuristicProfiler.py -l trickySearch -p FoodSearchProblem -H nullHeuristic,foodHeuristic
+"""
+
+import search, searchAgents, pacman, layout, util
+import sys, time, random, heapq
+
+class CountingProblem:
+    """
+    Wraps a search problem to count the calls to getSuccessors.  Everything
+    else, including what heuristics read from the problem, is delegated.
+    """
+
+    def __init__(self, problem):
+        self.problem = problem
+        self.expanded = 0
+
+    def getSuccessors(self, state):
+        self.expanded += 1
+        return self.problem.getSuccessors(state)
+
+    def __getattr__(self, name):
+        return getattr(self.problem, name)
+
+def sampleStates(problem, numStates, seed=0):
+    """
+    Returns up to numStates states drawn at random from the first
+    10 * numStates states found by breadth first search from the start.
+    """
+    start = problem.getStartState()
+    seen = set([start])
+    queue = util.Queue()
+    queue.push(start)
+    states = []
+    while not queue.isEmpty() and len(states) < 10 * numStates:
+        state = queue.pop()
+        states.append(state)
+        for next, action, cost in problem.getSuccessors(state):
+            if next not in seen:
+                seen.add(next)
+                queue.push(next)
+    if len(states) > numStates:
+        states = random.Random(seed).sample(states, numStates)
+    return states
+
+def trueCosts(problem, states, referenceHeuristic=search.nullHeuristic, maxExpansions=100000):
+    """
+    Returns a dictionary from states to the cost of their cheapest path to a
+    goal.  Each state still missing is searched from with A* under
+    referenceHeuristic (which must be consistent; the null heuristic gives
+    uniform cost search), and every state on the path found gets its cost.
+    States whose cost is already known end the paths through them, with
+    their exact cost as priority.  States whose search exceeds maxExpansions
+    are left out.
+    """
+    costs = {}
+    for source in states:
+        if source in costs: continue
+        # Entries are (priority, tie breaker, cost so far, state, parent, whether the priority is exact)
+        frontier = [(referenceHeuristic(source, problem), 0, 0, source, None, False)]
+        parents, costSoFar = {}, {}
+        counter = 1
+        while frontier and len(parents) < maxExpansions:
+            priority, _, g, state, parent, exact = heapq.heappop(frontier)
+            if state in parents: continue
+            parents[state], costSoFar[state] = parent, g
+            if exact or problem.isGoalState(state):
+                # Label the path back to the source
+                while state != None:
+                    costs[state] = priority - costSoFar[state]
+                    state = parents[state]
+                break
+            for next, action, stepCost in problem.getSuccessors(state):
+                if next in parents: continue
+                if next in costs:
+                    heapq.heappush(frontier, (g + stepCost + costs[next], counter, g + stepCost, next, state, True))
+                else:
+                    heapq.heappush(frontier, (g + stepCost + referenceHeuristic(next, problem), counter, g + stepCost, next, state, False))
+                counter += 1
+    return costs
+
+def effectiveBranchingFactor(numExpanded, depth):
+    """
+    Solves numExpanded + 1 = 1 + b + b^2 + ... + b^depth for b by bisection.
+    """
+    if depth == 0: return None
+    def treeSize(b): return sum([b ** i for i in range(depth + 1)])
+    # b^depth alone is below the tree size, which bounds b
+    low, high = 0.0, max((numExpanded + 1.0) ** (1.0 / depth), 1.0)
+    for i in range(60):
+        middle = (low + high) / 2
+        if treeSize(middle) < numExpanded + 1: low = middle
+        else: high = middle
+    return (low + high) / 2
+
+def profileHeuristic(problem, heuristic, states, costs, tolerance=1e-9):
+    """
+    Profiles heuristic on problem over the sampled states, given their true
+    costs from trueCosts.  Returns a dictionary of the measures described
+    above; the problem should be fresh, since A* is run on it.
+    """
+    calls, seconds = [0], [0.0]
+    clock = time.perf_counter
+    def timed(state):
+        start = clock()
+        value = heuristic(state, problem)
+        seconds[0] += clock() - start
+        calls[0] += 1
+        return value
+
+    inadmissible, inconsistent, pairs, ratios = 0, 0, 0, []
+    for state in states:
+        h = timed(state)
+        if state in costs:
+            if h > costs[state] + tolerance: inadmissible += 1
+            if costs[state] > 0: ratios.append(h / float(costs[state]))
+        for next, action, stepCost in problem.getSuccessors(state):
+            pairs += 1
+            if h - timed(next) > stepCost + tolerance: inconsistent += 1
+
+    counting = CountingProblem(problem)
+    start = clock()
+    actions = search.aStarSearch(counting, heuristic)
+    aStarSeconds = clock() - start
+    return {'states': len(states),
+            'labelled': len([state for state in states if state in costs]),
+            'inadmissible': inadmissible,
+            'inconsistent': inconsistent,
+            'pairs': pairs,
+            'meanRatio': sum(ratios) / len(ratios) if ratios else None,
+            'calls': calls[0],
+            'secondsPerCall': seconds[0] / max(calls[0], 1),
+            'solutionCost': problem.getCostOfActions(actions),
+            'expanded': counting.expanded,
+            'branchingFactor': effectiveBranchingFactor(counting.expanded, len(actions)),
+            'aStarSeconds': aStarSeconds}
+
+def getHeuristic(name):
+    "Looks a heuristic up by name in searchAgents.py, then search.py."
+    if name in dir(searchAgents): return getattr(searchAgents, name)
+    if name in dir(search): return getattr(search, name)
+    raise AttributeError(name + ' is not a function in searchAgents.py or search.py.')
+
+def readCommand( argv ):
+    """
+    Processes the command used to run the profiler from the command line.
+    """
+    from optparse import OptionParser
+    usageStr = """
+    USAGE:      python heuristicProfiler.py <options>
+    EXAMPLES:   python heuristicProfiler.py -l mediumCorners -p CornersProblem -H nullHeuristic,cornersHeuristic
+                    - compares two heuristics on the corners problem
+    """
+    parser = OptionParser(usageStr)
+    parser.add_option('-l', '--layout', dest='layout',
+                      help=pacman.default('the LAYOUT_FILE from which to load the map layout'),
+                      metavar='LAYOUT_FILE', default='trickySearch')
+    parser.add_option('-p', '--problem', dest='problem',
+                      help=pacman.default('the search problem TYPE in searchAgents.py'),
+                      metavar='TYPE', default='FoodSearchProblem')
+    parser.add_option('-H', '--heuristics', dest='heuristics',
+                      help=pacman.default('comma separated NAMES of the heuristics to profile'),
+                      metavar='NAMES', default='nullHeuristic,foodHeuristic')
+    parser.add_option('-r', '--reference', dest='reference',
+                      help=pacman.default('a consistent heuristic used to compute true costs faster'),
+                      default='nullHeuristic')
+    parser.add_option('-n', '--numStates', dest='numStates', type='int',
+                      help=pacman.default('the number of STATES to sample'), metavar='STATES', default=200)
+    parser.add_option('-s', '--seed', dest='seed', type='int',
+                      help=pacman.default('Random seed used to sample states'), default=0)
+
+    options, otherjunk = parser.parse_args(argv)
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+    return options
+
+def runProfiler( options ):
+    lay = layout.getLayout( options.layout )
+    if lay == None: raise Exception("The layout " + options.layout + " cannot be found")
+    gameState = pacman.GameState()
+    gameState.initialize(lay, lay.getNumGhosts())
+    problemClass = getattr(searchAgents, options.problem)
+
+    problem = problemClass(gameState)
+    states = sampleStates(problem, options.numStates, options.seed)
+    costs = trueCosts(problem, states, getHeuristic(options.reference))
+    numKnown = len([state for state in states if state in costs])
+    print('%s on %s: %d sampled states, %d with known costs' % (options.problem, options.layout, len(states), numKnown))
+    print('Heuristic              Inadmissible  Inconsistent   h/h*   us/call  Expanded     b*   A*(s)')
+    for name in options.heuristics.split(','):
+        report = profileHeuristic(problemClass(gameState), getHeuristic(name), states, costs)
+        ratio, branching = report['meanRatio'], report['branchingFactor']
+        print('%-22s %12d %13d %6s %9.1f %9d %6s %7.2f' % (name, report['inadmissible'], report['inconsistent'],
+              ratio == None and '-' or '%.3f' % ratio, 1e6 * report['secondsPerCall'], report['expanded'],
+              branching == None and '-' or '%.3f' % branching, report['aStarSeconds']))
+
+if __name__ == '__main__':
+    runProfiler( readCommand( sys.argv[1:] ) )
@@ -16,13 +16,16 @@ from util import manhattanDistance
 from game import Grid
 import os
 import random
-from functools import reduce
 
 VISIBILITY_MATRIX_CACHE = {}
 
 class Layout:
     """
     A Layout manages the static information about the game board.
+
+    Layouts are treated as immutable once constructed: game states share a
+    single Layout instead of copying it.  Code that needs to change a layout
+    must work on its own copy from deepCopy().
     """
 
     def __init__(self, layoutText):
@@ -35,32 +38,59 @@ class Layout:
         self.numGhosts = 0
         self.processLayoutText(layoutText)
         self.layoutText = layoutText
-        self.totalFood = len(self.food.asList())
-        # self.initializeVisibilityMatrix()
+        self.totalFood = self.food.count()
+        self._fingerprint = None
+        # The visibility matrix is built on the first call to isVisibleFrom
 
     def getNumGhosts(self):
         return self.numGhosts
 
+    def getFingerprint(self):
+        """
+        Returns a hex digest of the layout text that identifies the layout
+        independently of the file it was loaded from.
+        """
+        if self._fingerprint == None:
+            import hashlib
+            self._fingerprint = hashlib.sha1('\n'.join(self.layoutText).encode()).hexdigest()
+        return self._fingerprint
+
     def initializeVisibilityMatrix(self):
+        """
+        Precomputes line of sight.  For every open cell and direction,
+        self.visibility[direction][x * height + y] is the number of half-cell
+        steps that can be seen from (x,y) looking that way before a wall; the
+        visible positions of a ray are always contiguous.  Matrices are shared
+        by all layouts with the same fingerprint.
+        """
         global VISIBILITY_MATRIX_CACHE
-        if reduce(str.__add__, self.layoutText) not in VISIBILITY_MATRIX_CACHE:
+        key = self.getFingerprint()
+        if key not in VISIBILITY_MATRIX_CACHE:
             from game import Directions
-            vecs = [(-0.5,0), (0.5,0),(0,-0.5),(0,0.5)]
-            dirs = [Directions.NORTH, Directions.SOUTH, Directions.WEST, Directions.EAST]
-            vis = Grid(self.width, self.height, {Directions.NORTH:set(), Directions.SOUTH:set(), Directions.EAST:set(), Directions.WEST:set(), Directions.STOP:set()})
-            for x in range(self.width):
-                for y in range(self.height):
-                    if self.walls[x][y] == False:
-                        for vec, direction in zip(vecs, dirs):
-                            dx, dy = vec
-                            nextx, nexty = x + dx, y + dy
-                            while (nextx + nexty) != int(nextx) + int(nexty) or not self.walls[int(nextx)][int(nexty)] :
-                                vis[x][y][direction].add((nextx, nexty))
-                                nextx, nexty = x + dx, y + dy
-            self.visibility = vis
-            VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)] = vis
-        else:
-            self.visibility = VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)]
+            import array
+            walls, width, height = self.walls, self.width, self.height
+            vis = dict([(d, array.array('H', [0] * (width * height))) for d in
+                        [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST, Directions.STOP]])
+            # Sweep every row and column once in each direction, counting the
+            # cells to the next wall
+            for x in range(width):
+                for direction, ys in [(Directions.NORTH, range(height - 1, -1, -1)), (Directions.SOUTH, range(height))]:
+                    steps, cells = vis[direction], 0
+                    for y in ys:
+                        if walls[x][y]: cells = 0
+                        else:
+                            cells += 1
+                            steps[x * height + y] = 2 * cells - 1
+            for y in range(height):
+                for direction, xs in [(Directions.EAST, range(width - 1, -1, -1)), (Directions.WEST, range(width))]:
+                    steps, cells = vis[direction], 0
+                    for x in xs:
+                        if walls[x][y]: cells = 0
+                        else:
+                            cells += 1
+                            steps[x * height + y] = 2 * cells - 1
+            VISIBILITY_MATRIX_CACHE[key] = vis
+        self.visibility = VISIBILITY_MATRIX_CACHE[key]
 
     def isWall(self, pos):
         x, col = pos
@@ -84,14 +114,43 @@ class Layout:
         return pos
 
     def isVisibleFrom(self, ghostPos, pacPos, pacDirection):
+        if not hasattr(self, 'visibility'): self.initializeVisibilityMatrix()
+        from game import Actions
         row, col = [int(x) for x in pacPos]
-        return ghostPos in self.visibility[row][col][pacDirection]
+        steps = self.visibility[pacDirection][row * self.height + col]
+        dx, dy = Actions.directionToVector(pacDirection, 0.5)
+        if dx == 0 and dy == 0: return False
+        # Number of half-cell steps from Pacman to the ghost along the ray
+        if dx == 0:
+            if ghostPos[0] != row: return False
+            k = (ghostPos[1] - col) / dy
+        else:
+            if ghostPos[1] != col: return False
+            k = (ghostPos[0] - row) / dx
+        return k == int(k) and 1 <= k <= steps
 
     def __str__(self):
         return "\n".join(self.layoutText)
 
     def deepCopy(self):
-        return Layout(self.layoutText[:])
+        """
+        Returns an independent copy of this layout, for callers that intend
+        to modify it.  The grids are copied directly instead of re-parsing
+        the layout text.
+        """
+        layout = Layout.__new__(Layout)
+        layout.width = self.width
+        layout.height = self.height
+        layout.walls = self.walls.copy()
+        layout.food = self.food.copy()
+        layout.capsules = self.capsules[:]
+        layout.agentPositions = self.agentPositions[:]
+        layout.numGhosts = self.numGhosts
+        layout.layoutText = self.layoutText[:]
+        layout.totalFood = self.totalFood
+        layout._fingerprint = self._fingerprint
+        if hasattr(self, 'visibility'): layout.visibility = self.visibility
+        return layout
 
     def processLayoutText(self, layoutText):
         """
@@ -129,22 +188,126 @@ class Layout:
         elif layoutChar in  ['1', '2', '3', '4']:
             self.agentPositions.append( (int(layoutChar), (x,y)))
             self.numGhosts += 1
+
 def getLayout(name, back = 2):
+    """
+    Finds a layout by name in layouts/ or the current directory, or in up to
+    back + 1 parent directories of it.  A precompiled .layc file next to the
+    .lay file is used when it is up to date (see compileLayout).  Names
+    starting with gen: describe a generated layout (see layoutGenerator.py).
+    """
+    if name.startswith('gen:'):
+        if name not in LAYOUT_CACHE:
+            import layoutGenerator
+            LAYOUT_CACHE[name] = (None, layoutGenerator.getGeneratedLayout(name))
+        return LAYOUT_CACHE[name][1]
     if name.endswith('.lay'):
-        layout = tryToLoad('layouts/' + name)
-        if layout == None: layout = tryToLoad(name)
+        candidates = ['layouts/' + name, name]
     else:
-        layout = tryToLoad('layouts/' + name + '.lay')
-        if layout == None: layout = tryToLoad(name + '.lay')
-    if layout == None and back >= 0:
-        curdir = os.path.abspath('.')
-        os.chdir('..')
-        layout = getLayout(name, back -1)
-        os.chdir(curdir)
-    return layout
+        candidates = ['layouts/' + name + '.lay', name + '.lay']
+    prefix = ''
+    for level in range(back + 2):
+        for candidate in candidates:
+            layout = tryToLoad(prefix + candidate)
+            if layout != None: return layout
+        prefix += '../'
+    return None
+
+# Layouts already loaded, by absolute path: (modification time, Layout)
+LAYOUT_CACHE = {}
 
 def tryToLoad(fullname):
+    """
+    Loads a layout file, reusing the Layout from an earlier load while the
+    file is unchanged.  Layouts are shared, so they must not be modified.
+    """
     if(not os.path.exists(fullname)): return None
-    f = open(fullname)
-    try: return Layout([line.strip() for line in f])
-    finally: f.close()
+    path = os.path.abspath(fullname)
+    mtime = os.path.getmtime(path)
+    if path in LAYOUT_CACHE and LAYOUT_CACHE[path][0] == mtime:
+        return LAYOUT_CACHE[path][1]
+    compiled = path + 'c'
+    if os.path.exists(compiled) and os.path.getmtime(compiled) >= mtime:
+        layout = loadCompiledLayout(compiled)
+    else:
+        f = open(fullname)
+        try: layout = Layout([line.strip() for line in f])
+        finally: f.close()
+    LAYOUT_CACHE[path] = (mtime, layout)
+    return layout
+
+COMPILED_MAGIC = b'PACLAY1\n'
+
+def _packColumns(grid):
+    "Packs each column of a Grid into an int, bit y set for grid[x][y]"
+    return [sum([1 << y for y, value in enumerate(column) if value]) for column in grid.data]
+
+def _unpackColumns(columns, width, height):
+    grid = Grid(0, 0) # Skips filling in a grid that is replaced below
+    grid.width, grid.height = width, height
+    # Reading the bits from a binary string is much faster than shifting
+    form = '0%db' % height
+    grid.data = [[bit == '1' for bit in format(column, form)[::-1]] for column in columns]
+    return grid
+
+def compileLayout(layout, fileName):
+    """
+    Writes a layout in the precompiled format: its walls and food as column
+    bitmaps together with its capsules, agents and text, so that loading it
+    does not parse the layout text.
+    """
+    import pickle, zlib
+    fields = {'width': layout.width,
+              'height': layout.height,
+              'walls': _packColumns(layout.walls),
+              'food': _packColumns(layout.food),
+              'capsules': layout.capsules,
+              'agentPositions': layout.agentPositions,
+              'numGhosts': layout.numGhosts,
+              'layoutText': layout.layoutText,
+              'totalFood': layout.totalFood,
+              'fingerprint': layout.getFingerprint()}
+    f = open(fileName, 'wb')
+    try:
+        f.write(COMPILED_MAGIC)
+        f.write(zlib.compress(pickle.dumps(fields, pickle.HIGHEST_PROTOCOL)))
+    finally:
+        f.close()
+
+def loadCompiledLayout(fileName):
+    import pickle, zlib
+    f = open(fileName, 'rb')
+    try:
+        if f.read(len(COMPILED_MAGIC)) != COMPILED_MAGIC:
+            raise Exception(fileName + ' is not a compiled layout')
+        fields = pickle.loads(zlib.decompress(f.read()))
+    finally:
+        f.close()
+    layout = Layout.__new__(Layout)
+    layout.width = fields['width']
+    layout.height = fields['height']
+    layout.walls = _unpackColumns(fields['walls'], layout.width, layout.height)
+    layout.food = _unpackColumns(fields['food'], layout.width, layout.height)
+    layout.capsules = fields['capsules']
+    layout.agentPositions = fields['agentPositions']
+    layout.numGhosts = fields['numGhosts']
+    layout.layoutText = fields['layoutText']
+    layout.totalFood = fields['totalFood']
+    layout._fingerprint = fields['fingerprint']
+    return layout
+
+if __name__ == '__main__':
+    """
+    Compiles layouts, writing name.layc next to each name.lay:
+
+    > python layout.py mediumClassic bigMaze
+    """
+    import sys
+    for name in sys.argv[1:]:
+        if not name.endswith('.lay'): name += '.lay'
+        fullname = name
+        if not os.path.exists(fullname): fullname = os.path.join('layouts', name)
+        layout = tryToLoad(fullname)
+        if layout == None: raise Exception("The layout " + name + " cannot be found")
+        compileLayout(layout, fullname + 'c')
+        print('Compiled %s' % (fullname + 'c'))
@@ -0,0 +1,163 @@
+# layoutGenerator.py
+# ------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Procedural layouts of any size, for finding the scaling limits of the search
+and game code.  A layout is fully determined by its parameters and seed:
+
+  kind:      'maze' (a perfect maze: exactly one path between two cells),
+             'corridors' (a maze with some walls knocked out, creating loops)
+             or 'open' (an open room with scattered pillars)
+  width, height: the size of the board, walls included (mazes round them
+             up to odd numbers)
+  food:      the fraction of free cells that hold food
+  ghosts:    the number of ghosts
+  capsules:  the number of capsules
+  loops:     for 'corridors', the fraction of inner walls removed
+  seed:      the random seed
+
+Generated layouts can be used wherever a layout name is accepted, through
+names of the form gen:kind,key=value,... for example
+
+> python pacman.py -l gen:maze,width=81,height=41,food=0.1,seed=3 -p SearchAgent
+> python benchmark.py -l gen:open,width=60,height=30,ghosts=8
+"""
+
+import random
+from layout import Layout
+
+DEFAULTS = {'kind': 'maze', 'width': 41, 'height': 21, 'food': 0.0, 'ghosts': 0,
+            'capsules': 0, 'loops': 0.1, 'seed': 0}
+
+def generateLayout(kind='maze', width=41, height=21, food=0.0, ghosts=0, capsules=0, loops=0.1, seed=0):
+    """
+    Returns a layout.Layout built from the parameters described above.
+    Pacman is placed in the top right free cell; with no food at all, a
+    single dot is placed at (1, 1), the default goal of PositionSearchProblem,
+    so the layout can be used as a search maze.
+    """
+    rng = random.Random(seed)
+    if kind in ['maze', 'corridors']:
+        walls = _maze(width, height, rng)
+        if kind == 'corridors': _knockOutWalls(walls, loops, rng)
+    elif kind == 'open':
+        walls = _openRoom(width, height, rng)
+    else:
+        raise Exception('Unknown layout kind: ' + str(kind))
+    width, height = len(walls), len(walls[0])
+
+    free = [(x, y) for x in range(width) for y in range(height) if not walls[x][y]]
+    chars = {}
+    pacman = free[-1]
+    chars[pacman] = 'P'
+    others = [cell for cell in free if cell != pacman]
+    rng.shuffle(others)
+    # Keep ghosts away from Pacman's start by taking the furthest cells first
+    byDistance = sorted(others, key=lambda cell: -(abs(cell[0] - pacman[0]) + abs(cell[1] - pacman[1])))
+    for cell in byDistance[:ghosts]:
+        chars[cell] = 'G'
+    rest = [cell for cell in others if cell not in chars]
+    for cell in rest[:capsules]:
+        chars[cell] = 'o'
+    rest = rest[capsules:]
+    numFood = int(round(food * len(rest)))
+    for cell in rest[:numFood]:
+        chars[cell] = '.'
+    if numFood == 0 and (1, 1) in rest:
+        chars[(1, 1)] = '.'
+
+    text = []
+    for y in range(height - 1, -1, -1):
+        row = []
+        for x in range(width):
+            if walls[x][y]: row.append('%')
+            else: row.append(chars.get((x, y), ' '))
+        text.append(''.join(row))
+    return Layout(text)
+
+def _maze(width, height, rng):
+    """
+    Carves a perfect maze with an iterative depth-first search.  Cells sit
+    at odd coordinates and the walls between them at even ones.
+    """
+    width, height = max(5, width | 1), max(5, height | 1)
+    walls = [[True] * height for x in range(width)]
+    start = (1, 1)
+    walls[1][1] = False
+    stack = [start]
+    while stack:
+        x, y = stack[-1]
+        options = [(x + dx, y + dy, dx, dy) for dx, dy in [(2, 0), (-2, 0), (0, 2), (0, -2)]
+                   if 0 < x + dx < width - 1 and 0 < y + dy < height - 1 and walls[x + dx][y + dy]]
+        if not options:
+            stack.pop()
+            continue
+        nx, ny, dx, dy = rng.choice(options)
+        walls[x + dx // 2][y + dy // 2] = False
+        walls[nx][ny] = False
+        stack.append((nx, ny))
+    return walls
+
+def _knockOutWalls(walls, fraction, rng):
+    "Removes a fraction of the inner walls that separate two maze cells."
+    width, height = len(walls), len(walls[0])
+    candidates = []
+    for x in range(1, width - 1):
+        for y in range(1, height - 1):
+            if not walls[x][y]: continue
+            if (x % 2 == 0 and y % 2 == 1) or (x % 2 == 1 and y % 2 == 0):
+                candidates.append((x, y))
+    rng.shuffle(candidates)
+    for x, y in candidates[:int(fraction * len(candidates))]:
+        walls[x][y] = False
+
+def _openRoom(width, height, rng, pillars=0.3):
+    """
+    An open room: walls around the border and pillars on some cells with
+    even coordinates, which never disconnect the room.
+    """
+    width, height = max(3, width), max(3, height)
+    walls = [[x == 0 or y == 0 or x == width - 1 or y == height - 1 for y in range(height)] for x in range(width)]
+    for x in range(2, width - 2, 2):
+        for y in range(2, height - 2, 2):
+            if rng.random() < pillars: walls[x][y] = True
+    return walls
+
+def parseLayoutName(name):
+    """
+    Turns a name like gen:corridors,width=80,seed=2 into generateLayout
+    keyword arguments.
+    """
+    args = dict(DEFAULTS)
+    pieces = name[len('gen:'):].split(',')
+    if pieces[0] and '=' not in pieces[0]:
+        args['kind'] = pieces.pop(0)
+    for piece in pieces:
+        if not piece: continue
+        key, value = piece.split('=')
+        if key not in DEFAULTS: raise Exception('Unknown layout parameter: ' + key)
+        args[key] = type(DEFAULTS[key])(value)
+    return args
+
+def getGeneratedLayout(name):
+    return generateLayout(**parseLayoutName(name))
+
+if __name__ == '__main__':
+    """
+    Prints a generated layout, e.g. to save it as a .lay file:
+
+    > python layoutGenerator.py gen:maze,width=101,height=51 > layouts/hugeMaze.lay
+    """
+    import sys
+    print(getGeneratedLayout(sys.argv[1]))
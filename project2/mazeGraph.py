@@ -0,0 +1,164 @@
+# mazeGraph.py
+# ------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Precomputed structure of a maze, shared by the search problems in
+searchAgents.py.
+
+Open cells are numbered, so that search states can hold a small integer
+instead of a position: cells[i] is the cell numbered i, cellIndex maps cells
+back to their numbers and moves[i] lists the (direction, next cell number)
+pairs of the moves out of cell i.
+
+Most open cells of a maze are corridor cells with exactly two open
+neighbors.  A MazeGraph keeps only the other cells (junctions and dead
+ends) as nodes, joined by corridors: a search that moves from node to node
+one corridor at a time expands far fewer states than one that moves a cell
+at a time.
+
+Wall grids never change during a game, so the graph is built once per grid
+by getMazeGraph and kept on the grid.
+"""
+
+from game import Directions, Actions
+
+# The order in which PositionSearchProblem tries the directions
+DIRECTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]
+UNREACHABLE = 999999
+
+class MazeGraph:
+    """
+    The numbered open cells of a wall grid, its junctions and dead ends and
+    the corridors between them.
+
+      nodes:      a dictionary from each node (x,y) to its corridors, one per
+                  open direction, as (end, actions, cells, corridor) tuples:
+                    end:      the node reached
+                    actions:  the directions followed, as a tuple
+                    cells:    the cells entered, end included
+                    corridor: an id shared by both ends of the corridor
+      corridorOf: a dictionary from each corridor cell to its corridor id.
+                  Corridors that form a loop without any node have no id.
+    """
+
+    def __init__(self, walls):
+        self.walls = walls
+        self.neighbors = {}
+        table = Actions.getActionTable(walls)
+        for cell in table:
+            x, y = cell
+            moves = []
+            for direction in DIRECTIONS:
+                dx, dy = Actions._directions[direction]
+                if not walls[x + dx][y + dy]: moves.append((direction, (x + dx, y + dy)))
+            self.neighbors[cell] = moves
+        self.cells = sorted(self.neighbors)
+        self.cellIndex = dict([(cell, i) for i, cell in enumerate(self.cells)])
+        self.moves = [tuple([(direction, self.cellIndex[next]) for direction, next in self.neighbors[cell]])
+                      for cell in self.cells]
+
+        self._distances = {}
+
+        self.nodes = {}
+        for cell, moves in self.neighbors.items():
+            if len(moves) != 2: self.nodes[cell] = []
+        self.corridorOf = {}
+        for node in sorted(self.nodes):
+            for direction, next in self.neighbors[node]:
+                end, actions, cells = self._follow(node, direction, next)
+                if len(cells) > 1 and cells[0] in self.corridorOf:
+                    corridor = self.corridorOf[cells[0]]
+                else:
+                    corridor = (node, direction)
+                    for cell in cells[:-1]: self.corridorOf[cell] = corridor
+                self.nodes[node].append((end, actions, cells, corridor))
+
+    def _follow(self, origin, direction, cell):
+        """
+        Walks from origin, first in the given direction to cell, then along the
+        corridor until a node is reached (or origin again, around a loop).
+        """
+        actions, cells = [direction], [cell]
+        while cell not in self.nodes and cell != origin:
+            reverse = Actions.reverseDirection(direction)
+            for direction, next in self.neighbors[cell]:
+                if direction != reverse: break
+            cell = next
+            actions.append(direction)
+            cells.append(cell)
+        return cell, tuple(actions), tuple(cells)
+
+    def getCorridors(self, cell):
+        """
+        Returns the corridors leaving any open cell, in the format of nodes.
+        For corridor cells the two ways along the corridor are walked.
+        """
+        if cell in self.nodes: return self.nodes[cell]
+        corridor = self.corridorOf.get(cell)
+        return [self._follow(cell, direction, next) + (corridor,) for direction, next in self.neighbors[cell]]
+
+    def isNode(self, cell):
+        return cell in self.nodes
+
+    def getDistances(self, cell):
+        """
+        Returns the maze distances from cell to every open cell, as a list
+        indexed by cell number (UNREACHABLE for cells that cannot be reached).
+        The lists are computed by breadth first search and kept.
+        """
+        if cell not in self._distances:
+            distances = [UNREACHABLE] * len(self.cells)
+            start = self.cellIndex[cell]
+            distances[start] = 0
+            frontier = [start]
+            distance = 0
+            while frontier:
+                distance += 1
+                nextFrontier = []
+                for i in frontier:
+                    for direction, next in self.moves[i]:
+                        if distances[next] == UNREACHABLE:
+                            distances[next] = distance
+                            nextFrontier.append(next)
+                frontier = nextFrontier
+            self._distances[cell] = distances
+        return self._distances[cell]
+
+def getMazeGraph(walls):
+    if walls._mazeGraph == None:
+        walls._mazeGraph = MazeGraph(walls)
+    return walls._mazeGraph
+
+def expandActions(actions):
+    """
+    Turns a plan made of corridor moves (tuples of directions), possibly mixed
+    with single directions, into a list of directions.
+    """
+    steps = []
+    for action in actions:
+        if isinstance(action, tuple): steps.extend(action)
+        else: steps.append(action)
+    return steps
+
+if __name__ == '__main__':
+    """
+    Prints how much the corridors of layouts compress:
+
+    > python mazeGraph.py bigMaze mediumCorners
+    """
+    import sys, layout
+    for name in sys.argv[1:]:
+        graph = getMazeGraph(layout.getLayout(name).walls)
+        numCorridors = sum([len(corridors) for corridors in graph.nodes.values()]) // 2
+        print('%s: %d open cells, %d nodes, %d corridors' % (name, len(graph.neighbors), len(graph.nodes), numCorridors))
@@ -71,14 +71,80 @@ class GameState:
     # Accessor methods: use these to access state data #
     ####################################################
 
-    # static variable keeps track of which states have had getLegalActions called
+    # static variables keep track of which states have been generated.  This is
+    # instrumentation only and is off unless enabled with setExploredTracking.
     explored = set()
+    exploredCount = 0
+    exploredTracking = None
+    exploredLimit = None
+
+    def setExploredTracking( mode='set', limit=None ):
+        """
+        Turns exploration tracking on or off for all GameStates.
+
+          mode:  None turns tracking off, 'count' only counts the successors
+                 generated and 'set' also retains every state in
+                 GameState.explored.
+          limit: with mode 'set', the maximum number of states retained;
+                 states past the limit are still counted.
+        """
+        if mode not in [None, 'count', 'set']:
+            raise Exception('Unknown exploration tracking mode: ' + str(mode))
+        GameState.exploredTracking = mode
+        GameState.exploredLimit = limit
+        GameState.explored = set()
+        GameState.exploredCount = 0
+    setExploredTracking = staticmethod(setExploredTracking)
+
     def getAndResetExplored():
-        tmp = GameState.explored.copy()
+        tmp = GameState.explored
         GameState.explored = set()
+        GameState.exploredCount = 0
         return tmp
     getAndResetExplored = staticmethod(getAndResetExplored)
 
+    def trackExplored( parent, successor ):
+        GameState.exploredCount += 1
+        if GameState.exploredTracking == 'set':
+            limit = GameState.exploredLimit
+            for state in [parent, successor]:
+                if limit == None or len(GameState.explored) < limit:
+                    GameState.explored.add(state)
+    trackExplored = staticmethod(trackExplored)
+
+    # Optional transposition table of successors, shared by all GameStates and
+    # enabled with setSuccessorCache.
+    successorCache = None
+    successorCacheSize = 0
+    successorCacheHits = 0
+    successorCacheMisses = 0
+
+    def setSuccessorCache( size ):
+        """
+        Enables a least-recently-used cache of up to size successors for
+        generateSuccessor, or disables it when size is 0 or None.  Cached
+        successors are shared between callers, so they must not be modified.
+        """
+        import collections
+        if size:
+            GameState.successorCache = collections.OrderedDict()
+        else:
+            GameState.successorCache = None
+        GameState.successorCacheSize = size
+        GameState.successorCacheHits = 0
+        GameState.successorCacheMisses = 0
+    setSuccessorCache = staticmethod(setSuccessorCache)
+
+    def getSuccessorCacheStats():
+        """
+        Returns a tuple (hits, misses, entries) for the successor cache.
+        """
+        cache = GameState.successorCache
+        entries = 0
+        if cache != None: entries = len(cache)
+        return GameState.successorCacheHits, GameState.successorCacheMisses, entries
+    getSuccessorCacheStats = staticmethod(getSuccessorCacheStats)
+
     def getLegalActions( self, agentIndex=0 ):
         """
         Returns the legal actions for the agent specified.
@@ -98,6 +164,18 @@ class GameState:
         # Check that successors exist
         if self.isWin() or self.isLose(): raise Exception('Can\'t generate a successor of a terminal state.')
 
+        cache = GameState.successorCache
+        if cache != None:
+            # States only compare their dynamic contents, so the layout is part of the key
+            key = (self, self.data.layout, agentIndex, action)
+            cached = cache.get(key)
+            if cached != None:
+                cache.move_to_end(key)
+                GameState.successorCacheHits += 1
+                if GameState.exploredTracking: GameState.trackExplored(self, cached)
+                return cached
+            GameState.successorCacheMisses += 1
+
         # Copy current state
         state = GameState(self)
 
@@ -120,8 +198,10 @@ class GameState:
         # Book keeping
         state.data._agentMoved = agentIndex
         state.data.score += state.data.scoreChange
-        GameState.explored.add(self)
-        GameState.explored.add(state)
+        if GameState.exploredTracking: GameState.trackExplored(self, state)
+        if cache != None:
+            cache[key] = state
+            if len(cache) > GameState.successorCacheSize: cache.popitem(last=False)
         return state
 
     def getLegalPacmanActions( self ):
@@ -174,7 +254,7 @@ class GameState:
         return self.data.capsules
 
     def getNumFood( self ):
-        return self.data.food.count()
+        return self.data.getNumFood()
 
     def getFood(self):
         """
@@ -271,11 +351,11 @@ class ClassicGameRules:
     def __init__(self, timeout=30):
         self.timeout = timeout
 
-    def newGame( self, layout, pacmanAgent, ghostAgents, display, quiet = False, catchExceptions=False):
+    def newGame( self, layout, pacmanAgent, ghostAgents, display, quiet = False, catchExceptions=False, trustedAgents=False, profiler=None, recorder=None):
         agents = [pacmanAgent] + ghostAgents[:layout.getNumGhosts()]
         initState = GameState()
         initState.initialize( layout, len(ghostAgents) )
-        game = Game(agents, display, self, catchExceptions=catchExceptions)
+        game = Game(agents, display, self, catchExceptions=catchExceptions, trustedAgents=trustedAgents, profiler=profiler, recorder=recorder)
         game.state = initState
         self.initialState = initState.deepCopy()
         self.quiet = quiet
@@ -331,7 +411,7 @@ class PacmanRules:
         """
         Returns a list of possible actions.
         """
-        return Actions.getPossibleActions( state.getPacmanState().configuration, state.data.layout.walls )
+        return Actions.getPossibleActions( state.data.agentStates[0].configuration, state.data.layout.walls )
     getLegalActions = staticmethod( getLegalActions )
 
     def applyAction( state, action ):
@@ -361,10 +441,8 @@ class PacmanRules:
         # Eat food
         if state.data.food[x][y]:
             state.data.scoreChange += 10
-            state.data.food = state.data.food.copy()
-            state.data.food[x][y] = False
+            state.data.removeFood(x, y)
             state.data._foodEaten = position
-            # TODO: cache numFood?
             numFood = state.getNumFood()
             if numFood == 0 and not state.data._lose:
                 state.data.scoreChange += 500
@@ -389,6 +467,9 @@ class GhostRules:
         reach a dead end, but can turn 90 degrees at intersections.
         """
         conf = state.getGhostState( ghostIndex ).configuration
+        entry = Actions.getActionTable( state.data.layout.walls ).get( conf.pos )
+        if entry != None:
+            return list( entry[3][conf.direction] )
         possibleActions = Actions.getPossibleActions( conf, state.data.layout.walls )
         reverse = Actions.reverseDirection( conf.direction )
         if Directions.STOP in possibleActions:
@@ -510,9 +591,13 @@ def readCommand( argv ):
     parser.add_option('-f', '--fixRandomSeed', action='store_true', dest='fixRandomSeed',
                       help='Fixes the random seed to always play the same game', default=False)
     parser.add_option('-r', '--recordActions', action='store_true', dest='record',
-                      help='Writes game histories to a file (named by the time they were played)', default=False)
+                      help='Writes game histories to a recording file (named by the time they were played)', default=False)
     parser.add_option('--replay', dest='gameToReplay',
-                      help='A recorded game file (pickle) to replay', default=None)
+                      help='A recording file (or an older pickled game) to replay', default=None)
+    parser.add_option('--replayGame', dest='replayGame', type='int',
+                      help=default('The number of the game of a recording to replay'), default=1)
+    parser.add_option('--replayFrom', dest='replayFrom', type='int',
+                      help=default('The move of the recorded game to start the replay from'), default=0)
     parser.add_option('-a','--agentArgs',dest='agentArgs',
                       help='Comma separated values sent to agent. e.g. "opt1=val1,opt2,opt3=val3"')
     parser.add_option('-x', '--numTraining', dest='numTraining', type='int',
@@ -523,6 +608,18 @@ def readCommand( argv ):
                       help='Turns on exception handling and timeouts during games', default=False)
     parser.add_option('--timeout', dest='timeout', type='int',
                       help=default('Maximum length of time an agent can spend computing in a single game'), default=30)
+    parser.add_option('-j', '--processes', dest='numProcesses', type='int',
+                      help=default('Number of processes to play games in parallel (no graphics when > 1)'), default=1)
+    parser.add_option('--resultsFile', dest='resultsFile',
+                      help='Appends the result of every game to this JSONL file', default=None)
+    parser.add_option('--successorCache', dest='successorCache', type='int',
+                      help='Caches up to this many successor states for agents that search the game tree', default=0)
+    parser.add_option('--profile', dest='profileFile',
+                      help='Writes per-agent timings of all games to this JSON (or .csv) file and prints a summary', default=None)
+    parser.add_option('--cProfile', action='store_true', dest='useCProfile',
+                      help='With --profile, also runs the agents under cProfile', default=False)
+    parser.add_option('--trusted', action='store_true', dest='trustedAgents',
+                      help='Agents are trusted not to modify the states they are given; skips per-move copies and SIGALRM timeouts', default=False)
 
     options, otherjunk = parser.parse_args(argv)
     if len(otherjunk) != 0:
@@ -531,18 +628,23 @@ def readCommand( argv ):
 
     # Fix the random seed
     if options.fixRandomSeed: random.seed('cs188')
+    if options.successorCache: GameState.setSuccessorCache(options.successorCache)
 
     # Choose a layout
     args['layout'] = layout.getLayout( options.layout )
     if args['layout'] == None: raise Exception("The layout " + options.layout + " cannot be found")
 
     # Choose a Pacman agent
-    noKeyboard = options.gameToReplay == None and (options.textGraphics or options.quietGraphics)
+    noKeyboard = options.gameToReplay == None and (options.textGraphics or options.quietGraphics or options.numProcesses > 1)
     pacmanType = loadAgent(options.pacman, noKeyboard)
     agentOpts = parseAgentArgs(options.agentArgs)
     if options.numTraining > 0:
         args['numTraining'] = options.numTraining
         if 'numTraining' not in agentOpts: agentOpts['numTraining'] = options.numTraining
+    # Agents that budget their thinking time are told the game's timeout
+    init = pacmanType.__init__
+    if '__code__' in dir(init) and 'timeout' in init.__code__.co_varnames[:init.__code__.co_argcount] and 'timeout' not in agentOpts:
+        agentOpts['timeout'] = options.timeout
     pacman = pacmanType(**agentOpts) # Instantiate Pacman with agentArgs
     args['pacman'] = pacman
 
@@ -555,8 +657,8 @@ def readCommand( argv ):
     ghostType = loadAgent(options.ghost, noKeyboard)
     args['ghosts'] = [ghostType( i+1 ) for i in range( options.numGhosts )]
 
-    # Choose a display format
-    if options.quietGraphics:
+    # Choose a display format; parallel games are always played headless
+    if options.quietGraphics or options.numProcesses > 1:
         import textDisplay
         args['display'] = textDisplay.NullGraphics()
     elif options.textGraphics:
@@ -570,10 +672,20 @@ def readCommand( argv ):
     args['record'] = options.record
     args['catchExceptions'] = options.catchExceptions
     args['timeout'] = options.timeout
+    args['numProcesses'] = options.numProcesses
+    args['returnResults'] = options.numProcesses > 1 # Parallel games only have results to return
+    args['resultsFile'] = options.resultsFile
+    args['trustedAgents'] = options.trustedAgents
+    args['profileFile'] = options.profileFile
+    args['useCProfile'] = options.useCProfile
 
     # Special case: recorded games don't use the runGames method or args structure
     if options.gameToReplay != None:
         print('Replaying recorded game %s.' % options.gameToReplay)
+        import gameRecording
+        if gameRecording.isRecording(options.gameToReplay):
+            replayRecording(options.gameToReplay, args['display'], options.replayGame, options.replayFrom)
+            sys.exit(0)
         import pickle
         f = open(options.gameToReplay, 'rb')
         try: recorded = pickle.load(f)
@@ -607,12 +719,12 @@ def loadAgent(pacman, nographics):
                 return getattr(module, pacman)
     raise Exception('The agent ' + pacman + ' is not specified in any *Agents.py.')
 
-def replayGame( layout, actions, display ):
+def replayGame( layout, actions, display, state=None ):
     import pacmanAgents, ghostAgents
     rules = ClassicGameRules()
     agents = [pacmanAgents.GreedyAgent()] + [ghostAgents.RandomGhost(i+1) for i in range(layout.getNumGhosts())]
     game = rules.newGame( layout, agents[0], agents[1:], display )
-    state = game.state
+    if state == None: state = game.state
     display.initialize(state.data)
 
     for action in actions:
@@ -625,12 +737,88 @@ def replayGame( layout, actions, display ):
 
     display.finish()
 
-def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0, catchExceptions=False, timeout=30 ):
-    import __main__
+def replayRecording( fileName, display, gameNumber=1, startMove=0 ):
+    """
+    Replays a game of a recording file (see gameRecording.py) from startMove,
+    jumping there through the closest snapshot instead of re-simulating the
+    game from its start.
+    """
+    import gameRecording
+    reader = gameRecording.RecordingReader(fileName)
+    try: recorded = reader.getGame(gameNumber - 1)
+    finally: reader.close()
+    replayGame( recorded.layout, recorded.getMoveHistory()[startMove:], display, recorded.getState(startMove) )
+
+def gameResult( index, game, elapsed, training=False ):
+    """
+    Summarizes a finished game as a dictionary that can be written as JSON.
+    """
+    return {'game': index + 1,
+            'score': game.state.getScore(),
+            'win': game.state.isWin(),
+            'moves': len(game.moveHistory),
+            'time': elapsed,
+            'crashed': game.agentCrashed,
+            'training': training}
+
+def writeResult( resultsFile, result ):
+    """
+    Appends a game result to an open JSONL file, flushing it so that results
+    survive an interrupted run.
+    """
+    import json
+    resultsFile.write(json.dumps(result) + '\n')
+    resultsFile.flush()
+
+def recordingWriter( layout, suffix='' ):
+    """
+    Opens a recording file for the games of a run, named by the time it started.
+    """
+    import time, gameRecording
+    fname = 'recorded-games-' + '-'.join([str(t) for t in time.localtime()[1:6]]) + suffix + '.rec'
+    return gameRecording.RecordingWriter(fname, layout)
+
+def printSummary( scores, wins ):
+    winRate = wins.count(True)/ float(len(wins))
+    print('Average Score:', sum(scores) / float(len(scores)))
+    print('Scores:       ', ', '.join([str(score) for score in scores]))
+    print('Win Rate:      %d/%d (%.2f)' % (wins.count(True), len(wins), winRate))
+    print('Record:       ', ', '.join([ ['Loss', 'Win'][int(w)] for w in wins]))
+
+def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0, catchExceptions=False, timeout=30, numProcesses=1, resultsFile=None, seed=None, trustedAgents=False, profileFile=None, useCProfile=False, returnResults=False ):
+    """
+    Plays numGames games and prints a summary of the non-training games.
+    Returns the Game objects of the non-training games or, with
+    returnResults, their result dictionaries (see gameResult).
+
+    With numProcesses > 1 the games are played headless in a process pool
+    (see runGamesParallel), which only returns result dictionaries, so
+    returnResults is required.  When seed is given, every game is seeded from
+    it and its index as in the worker processes.  resultsFile, if given, is
+    the name of a JSONL file that receives one result per game as soon as it
+    finishes.  profileFile, if given, receives the per-agent timings of all
+    games (see gameProfiler.py), which are also summarized on the console.
+    """
+    if numProcesses > 1:
+        if not returnResults: raise Exception('Games played in parallel only return result dictionaries: pass returnResults=True')
+        return runGamesParallel( layout, pacman, ghosts, numGames, record, numTraining,
+                                 catchExceptions, timeout, numProcesses, resultsFile, seed, trustedAgents,
+                                 profileFile )
+
+    import __main__, time
     __main__.__dict__['_display'] = display
 
     rules = ClassicGameRules(timeout)
     games = []
+    gameResults = []
+    results = None
+    if resultsFile != None: results = open(resultsFile, 'a')
+    recorder = None
+    if record: recorder = recordingWriter(layout)
+    profiler = None
+    if profileFile != None:
+        import gameProfiler
+        profiler = gameProfiler.GameProfiler(useCProfile)
 
     for i in range( numGames ):
         beQuiet = i < numTraining
@@ -642,29 +830,107 @@ def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0
         else:
             gameDisplay = display
             rules.quiet = False
-        game = rules.newGame( layout, pacman, ghosts, gameDisplay, beQuiet, catchExceptions)
+        if seed != None: random.seed('%s-%d' % (seed, i))
+        game = rules.newGame( layout, pacman, ghosts, gameDisplay, beQuiet, catchExceptions, trustedAgents, profiler, recorder)
+        start = time.time()
         game.run()
-        if not beQuiet: games.append(game)
+        result = gameResult(i, game, time.time() - start, beQuiet)
+        if not beQuiet:
+            games.append(game)
+            gameResults.append(result)
+        if results != None: writeResult(results, result)
 
-        if record:
-            import time, pickle
-            fname = ('recorded-game-%d' % (i + 1)) +  '-'.join([str(t) for t in time.localtime()[1:6]])
-            f = open(fname, 'wb')
-            components = {'layout': layout, 'actions': game.moveHistory}
-            pickle.dump(components, f)
-            f.close()
+        if recorder != None:
+            recorder.writeGame(game)
+
+    if results != None: results.close()
+    if recorder != None: recorder.close()
+    if profiler != None: profiler.write(profileFile)
 
     if (numGames-numTraining) > 0:
         scores = [game.state.getScore() for game in games]
         wins = [game.state.isWin() for game in games]
-        winRate = wins.count(True)/ float(len(wins))
-        print('Average Score:', sum(scores) / float(len(scores)))
-        print('Scores:       ', ', '.join([str(score) for score in scores]))
-        print('Win Rate:      %d/%d (%.2f)' % (wins.count(True), len(wins), winRate))
-        print('Record:       ', ', '.join([ ['Loss', 'Win'][int(w)] for w in wins]))
+        printSummary(scores, wins)
+    if profiler != None: profiler.printSummary()
 
+    if returnResults: return gameResults
     return games
 
+# Game components shared with the worker processes of runGamesParallel, and
+# the recording file of each worker
+_WORKER_ARGS = None
+_WORKER_RECORDER = None
+
+def _initWorker( args ):
+    global _WORKER_ARGS
+    _WORKER_ARGS = args
+
+def _playGame( index ):
+    """
+    Plays a single headless game in a worker process and returns its result.
+    Every game is seeded from the base seed and its index, so results do not
+    depend on how the games are sharded across workers.
+    """
+    import textDisplay, time
+    layout, pacman, ghosts, record, numTraining, catchExceptions, timeout, seed, trustedAgents, profile = _WORKER_ARGS
+    random.seed('%s-%d' % (seed, index))
+    rules = ClassicGameRules(timeout)
+    profiler = None
+    if profile:
+        import gameProfiler
+        profiler = gameProfiler.GameProfiler()
+    global _WORKER_RECORDER
+    if record and _WORKER_RECORDER == None: _WORKER_RECORDER = recordingWriter(layout, '-%d' % os.getpid())
+    game = rules.newGame( layout, pacman, ghosts, textDisplay.NullGraphics(), True, catchExceptions, trustedAgents, profiler, _WORKER_RECORDER)
+    start = time.time()
+    game.run()
+    if _WORKER_RECORDER != None: _WORKER_RECORDER.writeGame(game)
+    result = gameResult(index, game, time.time() - start, index < numTraining)
+    if profiler != None: result['profile'] = profiler.asDict()
+    return result
+
+def runGamesParallel( layout, pacman, ghosts, numGames, record, numTraining = 0, catchExceptions=False, timeout=30, numProcesses=2, resultsFile=None, seed=None, trustedAgents=False, profileFile=None ):
+    """
+    Plays the games of runGames headless across numProcesses worker
+    processes and prints the same summary.  Returns the result dictionaries
+    (see gameResult) of the non-training games, in game order.
+
+    Workers are forked with their own copies of the agents, so agents that
+    learn across games do not share what they learn.  When seed is None a
+    base seed is drawn from the random module, which keeps runs reproducible
+    with --fixRandomSeed.  Timings for profileFile are merged from the
+    workers; cProfile statistics are not collected in parallel runs.
+    """
+    import multiprocessing
+    if seed == None: seed = random.randrange(2 ** 31)
+    args = (layout, pacman, ghosts, record, numTraining, catchExceptions, timeout, seed, trustedAgents, profileFile != None)
+    profiler = None
+    if profileFile != None:
+        import gameProfiler
+        profiler = gameProfiler.GameProfiler()
+
+    results = []
+    out = None
+    if resultsFile != None: out = open(resultsFile, 'a')
+    chunksize = max(1, numGames // (4 * numProcesses))
+    pool = multiprocessing.get_context('fork').Pool(numProcesses, _initWorker, (args,))
+    try:
+        for result in pool.imap_unordered(_playGame, range(numGames), chunksize):
+            if profiler != None: profiler.merge(result.pop('profile'))
+            results.append(result)
+            if out != None: writeResult(out, result)
+    finally:
+        pool.terminate()
+        if out != None: out.close()
+    if profiler != None: profiler.write(profileFile)
+
+    results.sort(key=lambda result: result['game'])
+    results = [result for result in results if not result['training']]
+    if len(results) > 0:
+        printSummary([result['score'] for result in results], [result['win'] for result in results])
+    if profiler != None: profiler.printSummary()
+    return results
+
 if __name__ == '__main__':
     """
     The main function called when pacman.py is run
@@ -17,6 +17,7 @@ from game import Agent
 import random
 import game
 import util
+import time
 
 class LeftTurnAgent(game.Agent):
     "An agent that turns left at every opportunity"
@@ -50,3 +51,163 @@ class GreedyAgent(Agent):
 
 def scoreEvaluation(state):
     return state.getScore()
+
+class AdversarialSearchAgent(Agent):
+    """
+    A Pacman that searches the game tree: Pacman maximizes the evaluation
+    while the ghosts either minimize it (mode=minimax, with alpha-beta
+    pruning) or move uniformly at random (mode=expectimax, like RandomGhost).
+
+    The search deepens one round of moves (Pacman's and every ghost's) at a
+    time until the move's time is spent, and plays the best move of the
+    deepest round it completed.  A transposition table keeps the value and
+    best move of every state searched, across rounds and moves; best moves
+    are tried first, then the other moves in order of evaluation, which
+    lets alpha-beta prune more.
+
+      evalFn:   the evaluation function, by name
+      mode:     minimax or expectimax
+      moveTime: the most seconds spent on a move
+      timeout:  the game's timeout (pacman.py passes its --timeout).  A move
+                never takes more than half of ClassicGameRules.getMoveTimeout,
+                nor more than a fiftieth of what is left of getMaxTotalTime
+      depth:    a fixed number of rounds to search instead, or 0
+
+    > python pacman.py -p AdversarialSearchAgent -a mode=minimax,moveTime=0.1
+    """
+
+    TABLE_SIZE = 100000 # The transposition table is cleared when it holds more states
+
+    def __init__(self, evalFn='searchEvaluation', mode='expectimax', moveTime='0.05', timeout='30', depth='0'):
+        Agent.__init__(self, 0)
+        self.evaluationFunction = util.lookup(evalFn, globals())
+        assert self.evaluationFunction != None
+        if mode not in ['minimax', 'expectimax']: raise Exception('Unknown search mode: ' + mode)
+        self.minimax = mode == 'minimax'
+        from pacman import ClassicGameRules
+        rules = ClassicGameRules(float(timeout))
+        self.moveTime = min(float(moveTime), 0.5 * rules.getMoveTimeout(self.index))
+        self.totalTime = rules.getMaxTotalTime(self.index)
+        self.depth = int(depth)
+        self.table = {}
+        self.timeUsed = 0.0
+
+    def registerInitialState(self, state):
+        self.timeUsed = 0.0
+
+    def getAction(self, state):
+        start = time.perf_counter()
+        if self.depth > 0: self.deadline = None
+        else: self.deadline = start + min(self.moveTime, 0.02 * (self.totalTime - self.timeUsed))
+        if len(self.table) > self.TABLE_SIZE: self.table = {}
+        self.evaluations = {}
+        bestAction = self._getActions(state, 0)[0]
+        depth = 1
+        try:
+            while True:
+                value, action = self._search(state, 0, depth, -float('inf'), float('inf'))
+                if action != None: bestAction = action
+                if depth == self.depth or state.getNumAgents() * depth > 1000: break
+                depth += 1
+        except _OutOfTime:
+            pass
+        self.timeUsed += time.perf_counter() - start
+        return bestAction
+
+    def _getActions(self, state, agentIndex):
+        actions = state.getLegalActions(agentIndex)
+        if agentIndex == 0 and Directions.STOP in actions and len(actions) > 1: actions.remove(Directions.STOP)
+        return actions
+
+    def _evaluate(self, state):
+        value = self.evaluations.get(state)
+        if value == None:
+            value = self.evaluationFunction(state)
+            self.evaluations[state] = value
+        return value
+
+    def _search(self, state, agentIndex, depth, alpha, beta):
+        """
+        Returns (value, best action) of state with agentIndex to move and
+        depth rounds left, within the alpha-beta window.
+        """
+        if self.deadline != None and time.perf_counter() > self.deadline: raise _OutOfTime()
+        if state.isWin() or state.isLose() or (agentIndex == 0 and depth == 0):
+            return self._evaluate(state), None
+
+        key = _tableKey(state, agentIndex)
+        entry = self.table.get(key)
+        tableAction = None
+        if entry != None:
+            entryDepth, value, bound, tableAction = entry
+            if entryDepth >= depth:
+                if bound == _EXACT: return value, tableAction
+                if bound == _LOWER: alpha = max(alpha, value)
+                else: beta = min(beta, value)
+                if alpha >= beta: return value, tableAction
+
+        nextAgent = (agentIndex + 1) % state.getNumAgents()
+        nextDepth = depth
+        if nextAgent == 0: nextDepth -= 1
+        successors = [(state.generateSuccessor(agentIndex, action), action) for action in self._getActions(state, agentIndex)]
+        maximizing = agentIndex == 0
+        if maximizing or self.minimax:
+            # Best moves first: the table's, then by evaluation
+            successors.sort(key=lambda pair: (pair[1] != tableAction,
+                                              maximizing and -self._evaluate(pair[0]) or self._evaluate(pair[0])))
+
+        if not maximizing and not self.minimax:
+            total = 0.0
+            for successor, action in successors:
+                total += self._search(successor, nextAgent, nextDepth, -float('inf'), float('inf'))[0]
+            value = total / len(successors)
+            self.table[key] = (depth, value, _EXACT, None)
+            return value, None
+
+        originalAlpha, originalBeta = alpha, beta
+        bestValue, bestAction = maximizing and -float('inf') or float('inf'), None
+        for successor, action in successors:
+            value = self._search(successor, nextAgent, nextDepth, alpha, beta)[0]
+            if maximizing:
+                if value > bestValue: bestValue, bestAction = value, action
+                alpha = max(alpha, value)
+            else:
+                if value < bestValue: bestValue, bestAction = value, action
+                beta = min(beta, value)
+            if alpha >= beta: break
+        if bestValue <= originalAlpha: bound = _UPPER
+        elif bestValue >= originalBeta: bound = _LOWER
+        else: bound = _EXACT
+        self.table[key] = (depth, bestValue, bound, bestAction)
+        return bestValue, bestAction
+
+# Kinds of values in the transposition table of AdversarialSearchAgent
+_EXACT, _LOWER, _UPPER = 0, 1, 2
+
+def _tableKey(state, agentIndex):
+    """
+    The transposition table key of a state: everything GameStateData compares,
+    with the food grid replaced by its Zobrist key, so the table does not keep
+    whole states alive.
+    """
+    data = state.data
+    agents = tuple([(s.configuration.pos, s.configuration.direction, s.scaredTimer) for s in data.agentStates])
+    return (agents, data.getFoodHash(), tuple(data.capsules), data.score, agentIndex)
+
+class _OutOfTime(Exception):
+    pass
+
+def searchEvaluation(state):
+    """
+    The score, less the distance to the closest food, plus a bonus for being
+    close to scared ghosts.
+    """
+    if state.isWin() or state.isLose(): return state.getScore()
+    x, y = state.getPacmanPosition()
+    foodDistances = [abs(x - fx) + abs(y - fy) for fx, fy in state.getFood().asList()]
+    value = state.getScore() - 1.5 * min(foodDistances)
+    for ghost in state.getGhostStates():
+        if ghost.scaredTimer > 0:
+            gx, gy = ghost.getPosition()
+            value += 50.0 / (1 + abs(x - gx) + abs(y - gy))
+    return value
@@ -0,0 +1,70 @@
+# planCache.py
+# ------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+An on-disk cache of the plans found by SearchAgent, so that games replayed
+on the same layout with the same search start without searching again.
+
+Each plan is a small JSON file in the cache directory, named after a digest
+of its key.  The key holds everything the plan depends on: the layout
+fingerprint, Pacman's start position and remaining food, and the names of
+the problem type, search function and heuristic.  Loaded plans are still
+checked against the problem (see SearchAgent.registerInitialState).
+"""
+
+import hashlib, json, os
+
+class PlanCache:
+
+    def __init__(self, directory):
+        self.directory = directory
+        if not os.path.isdir(directory): os.makedirs(directory)
+
+    def getKey(self, state, problemName, functionName, heuristicName):
+        """
+        Returns the key of the plans for the given start GameState.
+        """
+        return [state.data.layout.getFingerprint(), list(state.getPacmanPosition()), state.data.getFoodHash(),
+                problemName, functionName, heuristicName]
+
+    def _getFileName(self, key):
+        digest = hashlib.sha1(json.dumps(key).encode()).hexdigest()
+        return os.path.join(self.directory, digest + '.json')
+
+    def get(self, key):
+        """
+        Returns the (actions, cost) stored under key, or None.
+        """
+        fileName = self._getFileName(key)
+        if not os.path.exists(fileName): return None
+        try:
+            f = open(fileName)
+            try: entry = json.load(f)
+            finally: f.close()
+        except ValueError:
+            return None # Unreadable, e.g. truncated: searched again and rewritten
+        if entry.get('key') != key: return None
+        return entry['actions'], entry['cost']
+
+    def put(self, key, actions, cost):
+        """
+        Stores a plan.  The file is written under a temporary name and renamed,
+        so concurrent games never read a partial plan.
+        """
+        fileName = self._getFileName(key)
+        temporary = '%s.%d.tmp' % (fileName, os.getpid())
+        f = open(temporary, 'w')
+        try: json.dump({'key': key, 'actions': list(actions), 'cost': cost}, f)
+        finally: f.close()
+        os.replace(temporary, fileName)
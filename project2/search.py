@@ -18,6 +18,7 @@ Pacman agents (in searchAgents.py).
 """
 
 import util
+import time
 
 class SearchProblem:
     """
@@ -74,9 +75,10 @@ def tinyMazeSearch(problem):
 
 
 class Node:
-    def __init__(self, state, actions=[]):
+    def __init__(self, state, actions=[], cost=0):
         self.STATE = state
         self.ACTIONS = actions
+        self.COST = cost
 
 
 def depthFirstSearch(problem):
@@ -127,7 +129,7 @@ def uniformCostSearch(problem):
             explored.add(node.STATE)
             for state, action, cost in problem.getSuccessors(node.STATE):
                 child = Node(state, node.ACTIONS + [action])
-                frontier.update(child, problem.getCostOfActions(child.ACTIONS) + cost)
+                frontier.update(child, problem.getCostOfActions(child.ACTIONS))
 
 
 def nullHeuristic(state, problem=None):
@@ -139,21 +141,84 @@ def nullHeuristic(state, problem=None):
 
 
 def aStarSearch(problem, heuristic=nullHeuristic):
-    """Search the node that has the lowest combined cost and heuristic first."""
-    frontier = util.PriorityQueue()
-    explored = set()
-    frontier.push(Node(problem.getStartState()), 0)
-    while True:
-        node = frontier.pop()
-        if problem.isGoalState(node.STATE):
-            return node.ACTIONS
-        if node.STATE not in explored:
-            explored.add(node.STATE)
-            for state, action, cost in problem.getSuccessors(node.STATE):
-                nodePath = node.ACTIONS + [action]
-                priority = problem.getCostOfActions(nodePath) + heuristic(state, problem)
-                if state not in explored:
-                    frontier.push(Node(state, nodePath), priority)
+    """
+    Search the node that has the lowest combined cost and heuristic first.
+
+    A heuristic may also have a batch attribute: a function batch(states,
+    problem) returning the heuristic values of a list of states.  All the
+    successors of an expansion are then scored with a single call, which
+    lets expensive heuristics share work (or vectorize it) across them.
+    """
+    return AnytimeAStar(problem, heuristic).run(float('inf'))
+
+class AnytimeAStar:
+    """
+    An A* search that runs in slices until a deadline, for agents that must
+    answer in time; aStarSearch runs it without one.  Between slices,
+    getPartialPlan gives the path to the most promising node found so far.
+    """
+
+    def __init__(self, problem, heuristic=nullHeuristic):
+        self.problem = problem
+        self.heuristic = heuristic
+        self.frontier = util.PriorityQueue()
+        self.explored = set()
+        self.solution = None
+        self.exhausted = False
+        self.expanded = 0
+        start = Node(problem.getStartState())
+        h = heuristic(start.STATE, problem)
+        self.frontier.push(start, h)
+        self.startValue = h
+        self.best, self.bestKey = start, (h, 0)
+
+    def run(self, deadline):
+        """
+        Searches until a solution is found, the state space is exhausted or
+        time.perf_counter() reaches deadline.  Returns the solution, or None.
+        """
+        problem, heuristic = self.problem, self.heuristic
+        batch = getattr(heuristic, 'batch', None)
+        clock = time.perf_counter
+        while self.solution == None and not self.exhausted and clock() < deadline:
+            if self.frontier.isEmpty():
+                self.exhausted = True
+                break
+            node = self.frontier.pop()
+            if problem.isGoalState(node.STATE):
+                self.solution = node.ACTIONS
+                break
+            if node.STATE in self.explored: continue
+            self.explored.add(node.STATE)
+            self.expanded += 1
+            successors = problem.getSuccessors(node.STATE)
+            if batch != None:
+                values = batch([state for state, action, cost in successors], problem)
+            else:
+                values = [heuristic(state, problem) for state, action, cost in successors]
+            for (state, action, cost), value in zip(successors, values):
+                if state in self.explored: continue
+                child = Node(state, node.ACTIONS + [action], node.COST + cost)
+                self.frontier.push(child, child.COST + value)
+                if (value, child.COST) < self.bestKey:
+                    self.best, self.bestKey = child, (value, child.COST)
+        return self.solution
+
+    def getPartialPlan(self):
+        """
+        Returns the path to the node with the lowest heuristic value, and the
+        lowest cost among those.  While no node has a lower value than the
+        start (always with nullHeuristic), the heuristic says nothing, and the
+        path goes to the frontier node of lowest f instead, the one of highest
+        cost on ties: the edge of the search that A* is pushing forward.
+        """
+        if self.bestKey[0] < self.startValue: return self.best.ACTIONS
+        edge, edgeKey = self.best, None
+        for priority, count, node in self.frontier.heap:
+            if node.STATE in self.explored: continue
+            if edgeKey == None or (priority, -node.COST) < edgeKey:
+                edge, edgeKey = node, (priority, -node.COST)
+        return edge.ACTIONS
 
 # Abbreviations
 bfs = breadthFirstSearch
@@ -41,6 +41,7 @@ import util
 import time
 import search
 import math
+import mazeGraph
 
 class GoWestAgent(Agent):
     "An agent that goes West until it can't."
@@ -70,11 +71,14 @@ class SearchAgent(Agent):
       depthFirstSearch or dfs
       breadthFirstSearch or bfs
 
+    With planCache=DIRECTORY, plans are kept on disk and reused by later
+    games that start from the same state with the same search (see
+    planCache.py).
 
     Note: You should NOT change any code in SearchAgent
     """
 
-    def __init__(self, fn='depthFirstSearch', prob='PositionSearchProblem', heuristic='nullHeuristic'):
+    def __init__(self, fn='depthFirstSearch', prob='PositionSearchProblem', heuristic='nullHeuristic', planCache=None):
         # Warning: some advanced Python magic is employed below to find the right functions and problems
 
         # Get the search function from the name and heuristic
@@ -92,6 +96,7 @@ class SearchAgent(Agent):
             else:
                 raise AttributeError(heuristic + ' is not a function in searchAgents.py or search.py.')
             print('[SearchAgent] using function %s and heuristic %s' % (fn, heuristic))
+            self.heuristic = heur
             # Note: this bit of Python trickery combines the search algorithm and the heuristic
             self.searchFunction = lambda x: func(x, heuristic=heur)
 
@@ -101,6 +106,13 @@ class SearchAgent(Agent):
         self.searchType = globals()[prob]
         print('[SearchAgent] using problem type ' + prob)
 
+        self.planCache = None
+        if planCache != None:
+            import planCache as planCacheModule
+            self.planCache = planCacheModule.PlanCache(planCache)
+            if 'heuristic' not in func.__code__.co_varnames: heuristic = None
+            self.planNames = (prob, fn, heuristic)
+
     def registerInitialState(self, state):
         """
         This is the first time that the agent sees the layout of the game
@@ -113,8 +125,22 @@ class SearchAgent(Agent):
         if self.searchFunction == None: raise Exception("No search function provided for SearchAgent")
         starttime = time.time()
         problem = self.searchType(state) # Makes a new search problem
-        self.actions  = self.searchFunction(problem) # Find a path
+        cache = None
+        if 'planCache' in dir(self): cache = self.planCache
+        cached = None
+        if cache != None:
+            key = cache.getKey(state, *self.planNames)
+            cached = cache.get(key)
+            # A plan that no longer costs what it did is illegal or stale
+            if cached != None and problem.getCostOfActions(cached[0]) != cached[1]: cached = None
+        if cached != None:
+            self.actions = cached[0]
+            print('[SearchAgent] using a cached plan')
+        else:
+            self.actions  = self.searchFunction(problem) # Find a path
+            if 'expandActions' in dir(problem): self.actions = problem.expandActions(self.actions)
         totalCost = problem.getCostOfActions(self.actions)
+        if cache != None and cached == None: cache.put(key, self.actions, totalCost)
         print('Path found with total cost of %d in %.1f seconds' % (totalCost, time.time() - starttime))
         if '_expanded' in dir(problem): print('Search nodes expanded: %d' % problem._expanded)
 
@@ -134,6 +160,69 @@ class SearchAgent(Agent):
         else:
             return Directions.STOP
 
+class AnytimeSearchAgent(SearchAgent):
+    """
+    A SearchAgent that always answers in time, even on layouts too large to
+    plan for within the startup time.
+
+    It runs A* (see search.AnytimeAStar) for at most timeLimit seconds in
+    registerInitialState and, while no complete plan is found, for
+    moveTimeLimit more seconds at every getAction.  Until then Pacman heads
+    for the most promising node found so far, backing up along the way it
+    came when that node lies on another branch of the search tree.
+
+    > python pacman.py -l bigMaze -p AnytimeSearchAgent -a heuristic=manhattanHeuristic,timeLimit=0.01
+    """
+
+    def __init__(self, prob='PositionSearchProblem', heuristic='nullHeuristic', timeLimit='1.0', moveTimeLimit='0.1'):
+        SearchAgent.__init__(self, 'aStarSearch', prob, heuristic)
+        self.timeLimit = float(timeLimit)
+        self.moveTimeLimit = float(moveTimeLimit)
+
+    def registerInitialState(self, state):
+        starttime = time.perf_counter()
+        self.problem = self.searchType(state)
+        self.search = search.AnytimeAStar(self.problem, self.heuristic)
+        self.plan = None
+        self.taken = [] # The steps taken from the start, without those backed up
+        solution = self.search.run(starttime + self.timeLimit)
+        if solution != None:
+            self.plan = self._getSteps(solution)
+            totalCost = self.problem.getCostOfActions(self.plan)
+            print('Path found with total cost of %d in %.1f seconds' % (totalCost, time.perf_counter() - starttime))
+        else:
+            print('No path found in %.1f seconds; following a partial plan of %d steps' %
+                  (time.perf_counter() - starttime, len(self._getSteps(self.search.getPartialPlan()))))
+        print('Search nodes expanded: %d' % self.search.expanded)
+
+    def _getSteps(self, actions):
+        if 'expandActions' in dir(self.problem): return self.problem.expandActions(actions)
+        return list(actions)
+
+    def getAction(self, state):
+        """
+        Returns the next step along the complete plan if there is one, or else
+        along the path to the most promising node after searching a little
+        longer.
+        """
+        if self.plan == None and not self.search.exhausted:
+            solution = self.search.run(time.perf_counter() + self.moveTimeLimit)
+            if solution != None:
+                self.plan = self._getSteps(solution)
+                print('Path found after %d expansions' % self.search.expanded)
+        target = self.plan
+        if target == None: target = self._getSteps(self.search.getPartialPlan())
+
+        common = 0
+        while common < len(self.taken) and common < len(target) and self.taken[common] == target[common]:
+            common += 1
+        if common < len(self.taken):
+            return Actions.reverseDirection(self.taken.pop())
+        if common < len(target):
+            self.taken.append(target[common])
+            return target[common]
+        return Directions.STOP
+
 class PositionSearchProblem(search.SearchProblem):
     """
     A search problem defines the state space, start state, goal test, successor
@@ -226,6 +315,54 @@ class PositionSearchProblem(search.SearchProblem):
             cost += self.costFn((x,y))
         return cost
 
+class CompressedPositionSearchProblem(PositionSearchProblem):
+    """
+    A PositionSearchProblem that moves a whole corridor at a time: its states
+    are the junctions and dead ends of the maze (see mazeGraph.py), plus the
+    start and the goal.  A successor's action is the tuple of directions along
+    the corridor and its cost the sum of the costs of the cells entered, so
+    uniform cost search and A* (with manhattanHeuristic, for example) still
+    find the cheapest path.  Breadth first search finds the path crossing the
+    fewest corridors, not the shortest one.
+
+    Solutions are turned back into directions by expandActions, which
+    SearchAgent calls.  getCostOfActions accepts both kinds of plans.
+    """
+
+    def __init__(self, gameState, costFn = lambda x: 1, goal=(1,1), start=None, warn=True, visualize=True):
+        PositionSearchProblem.__init__(self, gameState, costFn, goal, start, warn, visualize)
+        self.graph = mazeGraph.getMazeGraph(self.walls)
+        self.goalCorridor = self.graph.corridorOf.get(goal)
+
+    def getSuccessors(self, state):
+        """
+        Returns a (successor, actions, cost) triple per corridor leaving state.
+        A corridor holding the goal ends there.
+        """
+        successors = []
+        for end, actions, cells, corridor in self.graph.getCorridors(state):
+            if corridor == self.goalCorridor and self.goal in cells:
+                length = cells.index(self.goal) + 1
+                end, actions, cells = self.goal, actions[:length], cells[:length]
+            cost = 0
+            for cell in cells: cost += self.costFn(cell)
+            successors.append((end, actions, cost))
+
+        # Bookkeeping for display purposes
+        self._expanded += 1 # DO NOT CHANGE
+        if state not in self._visited:
+            self._visited[state] = True
+            self._visitedlist.append(state)
+
+        return successors
+
+    def expandActions(self, actions):
+        return mazeGraph.expandActions(actions)
+
+    def getCostOfActions(self, actions):
+        if actions == None: return 999999
+        return PositionSearchProblem.getCostOfActions(self, mazeGraph.expandActions(actions))
+
 class StayEastSearchAgent(SearchAgent):
     """
     An agent for position search with a cost function that penalizes being in
@@ -270,7 +407,10 @@ class CornersProblem(search.SearchProblem):
     """
     This search problem finds paths through all four corners of a layout.
 
-    You must select a suitable state space and successor function
+    A state is a single int, cellIndex << 4 | visited, where cellIndex numbers
+    Pacman's cell (see mazeGraph.py) and bit i of visited is set once
+    corners[i] has been visited.  Successors come from a table built once from
+    the walls, so expanding a state only allocates its successor list.
     """
 
     def __init__(self, startingGameState):
@@ -285,42 +425,36 @@ class CornersProblem(search.SearchProblem):
             if not startingGameState.hasFood(*corner):
                 print('Warning: no food in corner ' + str(corner))
         self._expanded = 0 # DO NOT CHANGE; Number of search nodes expanded
-        # Please add any code here which you would like to use
-        # in initializing the problem
-        "*** YOUR CODE HERE ***"
-
-
+        self.heuristicInfo = {} # A dictionary for the heuristic to store information
+        self.graph = mazeGraph.getMazeGraph(self.walls)
+        self.cornerBits = {}
+        for i, corner in enumerate(self.corners):
+            self.cornerBits[corner] = self.cornerBits.get(corner, 0) | 1 << i
+        # For each cell, the (action, next cell's index and corner bits) of its moves
+        self.successorTable = []
+        for moves in self.graph.moves:
+            self.successorTable.append(tuple([(action, next << 4 | self.cornerBits.get(self.graph.cells[next], 0))
+                                              for action, next in moves]))
 
     def getStartState(self):
         """
         Returns the start state (in your state space, not the full Pacman state
         space)
         """
-        "*** YOUR CODE HERE ***"
-
-
-        util.raiseNotDefined()
+        return self.graph.cellIndex[self.startingPosition] << 4 | self.cornerBits.get(self.startingPosition, 0)
 
     def isGoalState(self, state):
         """
         Returns whether this search state is a goal state of the problem.
         """
-        "*** YOUR CODE HERE ***"
-
-        util.raiseNotDefined()
+        return state & 15 == 15
 
     def getSuccessors(self, state):
-
-        successors = []
-        for action in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
-            # Add a successor state to the successor list if the action is legal
-            # Here's a code snippet for figuring out whether a new position hits a wall:
-            #   x,y = currentPosition
-            #   dx, dy = Actions.directionToVector(action)
-            #   nextx, nexty = int(x + dx), int(y + dy)
-            #   hitsWall = self.walls[nextx][nexty]
-
-            "*** YOUR CODE HERE ***"
+        """
+        Returns successor states, the actions they require, and a cost of 1.
+        """
+        visited = state & 15
+        successors = [(next | visited, action, 1) for action, next in self.successorTable[state >> 4]]
         self._expanded += 1 # DO NOT CHANGE
         return successors
 
@@ -351,11 +485,48 @@ def cornersHeuristic(state, problem):
     This function should always return a number that is a lower bound on the
     shortest path from the state to a goal of the problem; i.e.  it should be
     admissible (as well as consistent).
+
+    The value is the length of the shortest walk from Pacman's cell through
+    the unvisited corners: the maze distance to the first corner plus the
+    shortest tour through the others, trying every first corner.  Maze
+    distances to the corners and the tours (only 4! orderings) are computed
+    once per problem, and values are memoized per state.
+    """
+    info = problem.heuristicInfo
+    if 'values' not in info: _initCornersHeuristic(problem)
+    value = info['values'][state]
+    if value == None:
+        remaining = ~state & 15
+        value = 0
+        if remaining:
+            cell = state >> 4
+            distances, tours = info['distances'], info['tours']
+            value = min([distances[i][cell] + tours[i][remaining & ~(1 << i)]
+                         for i in range(4) if remaining & 1 << i])
+        info['values'][state] = value
+    return value
+
+def _initCornersHeuristic(problem):
+    """
+    Stores in problem.heuristicInfo the maze distances from each corner to
+    every cell, the length tours[i][mask] of the shortest walk from corner i
+    through the corners in mask, and an empty memo of heuristic values.
     """
-    corners = problem.corners # These are the corner coordinates / self.corners = ((1,1), (1,top), (right, 1), (right, top))
-    walls = problem.walls # These are the walls of the maze, as a Grid (game.py)
-    "*** YOUR CODE HERE ***"
-    return 0 # Default to trivial solution
+    graph = problem.graph
+    corners = problem.corners
+    distances = []
+    for corner in corners:
+        if corner in graph.cellIndex: distances.append(graph.getDistances(corner))
+        else: distances.append([mazeGraph.UNREACHABLE] * len(graph.cells))
+    between = [[distances[i][graph.cellIndex[corner]] if corner in graph.cellIndex else mazeGraph.UNREACHABLE
+                for corner in corners] for i in range(4)]
+    tours = [[0] * 16 for i in range(4)]
+    for mask in sorted(range(1, 16), key=lambda mask: bin(mask).count('1')):
+        for i in range(4):
+            tours[i][mask] = min([between[i][j] + tours[j][mask & ~(1 << j)] for j in range(4) if mask & 1 << j])
+    problem.heuristicInfo['distances'] = distances
+    problem.heuristicInfo['tours'] = tours
+    problem.heuristicInfo['values'] = [None] * (len(graph.cells) << 4)
 
 class AStarCornersAgent(SearchAgent):
     "A SearchAgent for FoodSearchProblem using A* and your foodHeuristic"
@@ -378,12 +549,16 @@ class FoodSearchProblem:
         self.startingGameState = startingGameState
         self._expanded = 0 # DO NOT CHANGE
         self.heuristicInfo = {} # A dictionary for the heuristic to store information
+        self.graph = mazeGraph.getMazeGraph(self.walls)
 
     def getStartState(self):
         return self.start
 
     def isGoalState(self, state):
-        return state[1].count() == 0
+        # Stops at the first column that still has food instead of counting it all
+        for column in state[1].data:
+            if True in column: return False
+        return True
 
     def getSuccessors(self, state):
         "Returns successor states, the actions they require, and a cost of 1."
@@ -402,7 +577,7 @@ class FoodSearchProblem:
     def getCostOfActions(self, actions):
         """Returns the cost of a particular sequence of actions.  If those actions
         include an illegal move, return 999999"""
-        x,y= self.getStartState()[0]
+        x,y= self.start[0]
         cost = 0
         for action in actions:
             # figure out the next state and see whether it's legal
@@ -413,6 +588,43 @@ class FoodSearchProblem:
             cost += 1
         return cost
 
+class BitmaskFoodSearchProblem(FoodSearchProblem):
+    """
+    A FoodSearchProblem whose states are tuples ( cellIndex, foodMask ) where
+      cellIndex: the number of Pacman's cell (see mazeGraph.py)
+      foodMask:  an int whose bit i is set while foodCells[i] holds food
+
+    Successors, actions and costs are those of FoodSearchProblem, but a move
+    only clears a bit when it eats a dot and shares the mask otherwise, and
+    states hash in constant time.
+    """
+    def __init__(self, startingGameState):
+        FoodSearchProblem.__init__(self, startingGameState)
+        self.foodCells = self.start[1].asList()
+        foodBits = [0] * len(self.graph.cells)
+        for i, cell in enumerate(self.foodCells):
+            foodBits[self.graph.cellIndex[cell]] = 1 << i
+        # For each cell, the (action, next cell index, food bit of the next cell) of its moves
+        self.successorTable = [tuple([(action, next, foodBits[next]) for action, next in moves])
+                               for moves in self.graph.moves]
+        self.startState = (self.graph.cellIndex[self.start[0]], (1 << len(self.foodCells)) - 1)
+
+    def getStartState(self):
+        return self.startState
+
+    def isGoalState(self, state):
+        return state[1] == 0
+
+    def getSuccessors(self, state):
+        "Returns successor states, the actions they require, and a cost of 1."
+        successors = []
+        self._expanded += 1 # DO NOT CHANGE
+        mask = state[1]
+        for action, next, bit in self.successorTable[state[0]]:
+            if mask & bit: successors.append(((next, mask ^ bit), action, 1))
+            else: successors.append(((next, mask), action, 1))
+        return successors
+
 class AStarFoodSearchAgent(SearchAgent):
     "A SearchAgent for FoodSearchProblem using A* and your foodHeuristic"
     def __init__(self):
@@ -421,35 +633,109 @@ class AStarFoodSearchAgent(SearchAgent):
 
 def foodHeuristic(state, problem):
     """
-    Your heuristic for the FoodSearchProblem goes here.
-
-    This heuristic must be consistent to ensure correctness.  First, try to come
-    up with an admissible heuristic; almost all admissible heuristics will be
-    consistent as well.
+    A heuristic for the FoodSearchProblem, and BitmaskFoodSearchProblem.
 
-    If using A* ever finds a solution that is worse uniform cost search finds,
-    your heuristic is *not* consistent, and probably not admissible!  On the
-    other hand, inadmissible or inconsistent heuristics may find optimal
-    solutions, so be careful.
-
-    The state is a tuple ( pacmanPosition, foodGrid ) where foodGrid is a Grid
-    (see game.py) of either True or False. You can call foodGrid.asList() to get
-    a list of food coordinates instead.
-
-    If you want access to info like walls, capsules, etc., you can query the
-    problem.  For example, problem.walls gives you a Grid of where the walls
-    are.
+    The value is the maze distance from Pacman's cell to the nearest remaining
+    food plus the weight of a minimum spanning tree, under maze distance, of
+    all the remaining food.  Maze distances from every food are computed once
+    per problem, and tree weights are memoized per set of remaining food in a
+    least-recently-used cache of at most FOOD_MST_CACHE_SIZE sets.
+    """
+    info = problem.heuristicInfo
+    if 'foodCells' not in info: _initFoodHeuristic(problem)
+    cell, mask = _foodKey(state, problem)
+    if mask == 0: return 0
+    distances = info['distances']
+    nearest = min([distances[i][cell] for i in range(len(distances)) if mask >> i & 1])
+    return nearest + _foodTree(mask, info)
+
+def _foodHeuristicBatch(states, problem):
+    """
+    The values of foodHeuristic for a list of states (see aStarSearch).
+    Successors mostly share their food, so the remaining food and its tree
+    are looked up once per distinct food set.
+    """
+    info = problem.heuristicInfo
+    if 'foodCells' not in info: _initFoodHeuristic(problem)
+    distances = info['distances']
+    keys = [_foodKey(state, problem) for state in states]
+    remaining = {}
+    for cell, mask in keys:
+        if mask and mask not in remaining:
+            remaining[mask] = ([distances[i] for i in range(len(distances)) if mask >> i & 1], _foodTree(mask, info))
+    values = []
+    for cell, mask in keys:
+        if mask == 0:
+            values.append(0)
+        else:
+            rows, tree = remaining[mask]
+            values.append(min([row[cell] for row in rows]) + tree)
+    return values
+foodHeuristic.batch = _foodHeuristicBatch
 
-    If you want to *store* information to be reused in other calls to the
-    heuristic, there is a dictionary called problem.heuristicInfo that you can
-    use. For example, if you only want to count the walls once and store that
-    value, try: problem.heuristicInfo['wallCount'] = problem.walls.count()
-    Subsequent calls to this heuristic can access
-    problem.heuristicInfo['wallCount']
+def _foodKey(state, problem):
+    """
+    Returns Pacman's cell number and the bitmask of the remaining food of
+    either kind of food search state.
     """
     position, foodGrid = state
-    "*** YOUR CODE HERE ***"
-    return 0
+    if isinstance(foodGrid, int):
+        # A BitmaskFoodSearchProblem state, numbered the same way
+        return state
+    mask = 0
+    for i, (x, y) in enumerate(problem.heuristicInfo['foodCells']):
+        if foodGrid[x][y]: mask |= 1 << i
+    return problem.graph.cellIndex[position], mask
+
+def _foodTree(mask, info):
+    "Returns the memoized maze-distance MST weight of the food in mask."
+    cache = info['mstCache']
+    tree = cache.get(mask)
+    if tree == None:
+        tree = _foodTreeWeight(mask, info['between'])
+        cache[mask] = tree
+        if len(cache) > info['mstCacheSize']: cache.popitem(last=False)
+    else:
+        cache.move_to_end(mask)
+    return tree
+
+# Bound on the number of food sets whose spanning tree foodHeuristic keeps
+FOOD_MST_CACHE_SIZE = 100000
+
+def _initFoodHeuristic(problem):
+    """
+    Numbers the food of the start state, as BitmaskFoodSearchProblem does,
+    and stores in problem.heuristicInfo the maze distances from each food to
+    every cell and between food, plus an empty least-recently-used cache of
+    spanning tree weights.
+    """
+    import collections
+    graph = problem.graph
+    foodCells = problem.start[1].asList()
+    distances = [graph.getDistances(cell) for cell in foodCells]
+    info = problem.heuristicInfo
+    info['foodCells'] = foodCells
+    info['distances'] = distances
+    info['between'] = [[row[graph.cellIndex[cell]] for cell in foodCells] for row in distances]
+    info['mstCache'] = collections.OrderedDict()
+    info['mstCacheSize'] = FOOD_MST_CACHE_SIZE
+
+def _foodTreeWeight(mask, between):
+    """
+    Returns the weight of a minimum spanning tree, under maze distance, of
+    the food whose bits are set in mask (Prim's algorithm).
+    """
+    remaining = [i for i in range(len(between)) if mask >> i & 1]
+    first = remaining.pop()
+    closest = dict([(i, between[first][i]) for i in remaining])
+    weight = 0
+    while closest:
+        i = min(closest, key=closest.get)
+        weight += closest.pop(i)
+        row = between[i]
+        for j in closest:
+            if row[j] < closest[j]: closest[j] = row[j]
+    return weight
 
 
 
@@ -457,17 +743,22 @@ def foodHeuristic(state, problem):
 class ClosestDotSearchAgent(SearchAgent):
     "Search for all food using a sequence of searches"
     def registerInitialState(self, state):
+        """
+        Plans the whole sequence of trips to the closest dot at once with a
+        ClosestDotEngine, which answers each query without a new search.
+        Cells on the way to the closest dot hold no food, so each trip only
+        eats the dot it ends on.
+        """
         self.actions = []
-        currentState = state
-        while(currentState.getFood().count() > 0):
-            nextPathSegment = self.findPathToClosestDot(currentState) # The missing piece
+        engine = ClosestDotEngine(state.getWalls(), state.getFood())
+        position = state.getPacmanPosition()
+        engine.removeFood(position)
+        while engine.numFood > 0:
+            nextPathSegment, position = engine.getPathToClosestDot(position)
+            if nextPathSegment == None:
+                raise Exception('Some food cannot be reached from %s' % str(position))
             self.actions += nextPathSegment
-            for action in nextPathSegment:
-                legal = currentState.getLegalActions()
-                if action not in legal:
-                    t = (str(action), str(currentState))
-                    raise Exception('findPathToClosestDot returned an illegal move: %s!\n%s' % t)
-                currentState = currentState.generateSuccessor(0, action)
+            engine.removeFood(position)
         self.actionIndex = 0
         print('Path found with cost %d.' % len(self.actions))
 
@@ -482,8 +773,98 @@ class ClosestDotSearchAgent(SearchAgent):
         walls = gameState.getWalls()
         problem = AnyFoodSearchProblem(gameState)
 
-        "*** YOUR CODE HERE ***"
-        util.raiseNotDefined()
+        return search.bfs(problem)
+
+class ClosestDotEngine:
+    """
+    Maze distances from every cell to its closest remaining dot, kept up to
+    date as dots are eaten.
+
+    The distances start from one breadth first search from all the dots at
+    once.  Every cell also remembers which dot it is closest to, so when a
+    dot is removed only the cells that were closest to it are recomputed,
+    from the cells around them.  A query then walks downhill from Pacman's
+    cell, in time proportional to the length of the path.
+    """
+
+    def __init__(self, walls, food):
+        self.graph = mazeGraph.getMazeGraph(walls)
+        numCells = len(self.graph.cells)
+        self.distance = [mazeGraph.UNREACHABLE] * numCells
+        self.closest = [None] * numCells # The cell number of the closest dot
+        self.hasFood = [False] * numCells
+        frontier = []
+        for cell in food.asList():
+            i = self.graph.cellIndex[cell]
+            self.hasFood[i] = True
+            self.distance[i] = 0
+            self.closest[i] = i
+            frontier.append(i)
+        self.numFood = len(frontier)
+        self._spread([(0, i) for i in frontier])
+
+    def _spread(self, seeds):
+        """
+        Relaxes distances outwards from (distance, cell) seeds, cheapest first.
+        """
+        import heapq
+        heapq.heapify(seeds)
+        distance, closest, moves = self.distance, self.closest, self.graph.moves
+        while seeds:
+            d, i = heapq.heappop(seeds)
+            if d > distance[i]: continue
+            for action, next in moves[i]:
+                if d + 1 < distance[next]:
+                    distance[next] = d + 1
+                    closest[next] = closest[i]
+                    heapq.heappush(seeds, (d + 1, next))
+
+    def removeFood(self, cell):
+        """
+        Removes the dot in cell, if any, and recomputes the distances of the
+        cells it was the closest dot of.
+        """
+        dot = self.graph.cellIndex[cell]
+        if not self.hasFood[dot]: return
+        self.hasFood[dot] = False
+        self.numFood -= 1
+        distance, closest, moves = self.distance, self.closest, self.graph.moves
+        # Every cell reached from a dot has a neighbor one step closer to the
+        # same dot, so the cells closest to it are found by a search from it
+        region, inRegion = [dot], set([dot])
+        for i in region:
+            for action, next in moves[i]:
+                if closest[next] == dot and next not in inRegion:
+                    region.append(next)
+                    inRegion.add(next)
+        for i in region:
+            distance[i] = mazeGraph.UNREACHABLE
+            closest[i] = None
+        seeds = []
+        for i in region:
+            for action, next in moves[i]:
+                if closest[next] != None and distance[next] + 1 < distance[i]:
+                    distance[i] = distance[next] + 1
+                    closest[i] = closest[next]
+            if closest[i] != None: seeds.append((distance[i], i))
+        self._spread(seeds)
+
+    def getPathToClosestDot(self, position):
+        """
+        Returns (actions, dot): a shortest path from position to the closest
+        remaining dot and the cell of that dot, or (None, position) when no
+        dot can be reached.
+        """
+        i = self.graph.cellIndex[position]
+        if self.closest[i] == None: return None, position
+        distance, moves = self.distance, self.graph.moves
+        actions = []
+        while distance[i] > 0:
+            for action, next in moves[i]:
+                if distance[next] == distance[i] - 1: break
+            actions.append(action)
+            i = next
+        return actions, self.graph.cells[i]
 
 class AnyFoodSearchProblem(PositionSearchProblem):
     """
@@ -519,8 +900,7 @@ class AnyFoodSearchProblem(PositionSearchProblem):
 
         x,y = state
 
-        "*** YOUR CODE HERE ***"
-        util.raiseNotDefined()
+        return self.food[x][y]
 
 def mazeDistance(point1, point2, gameState):
     """
@@ -821,3 +821,40 @@ class CornerHeuristicPacman(testClasses.TestCase):
         handle.close()
         return True
 
+
+
+
+class BatchSimulatorConsistencyTest(testClasses.TestCase):
+    """
+    Replays regular games through batchSimulator.BatchSimulator (see
+    batchSimulator.checkConsistency), so that a change to the rules in
+    pacman.py that the simulator does not follow is caught.
+    """
+
+    def __init__(self, question, testDict):
+        super(BatchSimulatorConsistencyTest, self).__init__(question, testDict)
+        self.layoutName = testDict['layoutName']
+        self.numGames = int(testDict['numGames'])
+        self.ghostType = testDict['ghostType']
+
+    def execute(self, grades, moduleDict, solutionDict):
+        try:
+            import batchSimulator
+        except ImportError:
+            self.addMessage('NumPy is not installed, so the batch simulator is not checked')
+            return self.testPass(grades)
+        try:
+            compared = batchSimulator.checkConsistency(layout.getLayout(self.layoutName), self.numGames,
+                                                       ghostType=self.ghostType)
+        except Exception as data:
+            self.addMessage(str(data))
+            return self.testFail(grades)
+        self.addMessage('%d states of %d games with %s agree' % (compared, self.numGames, self.ghostType))
+        return self.testPass(grades)
+
+    def writeSolution(self, moduleDict, filePath):
+        handle = open(filePath, 'w')
+        handle.write('# This is the solution file for %s.\n' % self.path)
+        handle.write('# The games are compared with the simulator; nothing is stored.\n')
+        handle.close()
+        return True